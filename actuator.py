@@ -0,0 +1,208 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import ACTIONS
+
+logging.basicConfig(level=logging.INFO)
+
+# "pyautogui" drives the real cursor and keyboard, "recording" only records the calls
+ACTUATOR_BACKEND = os.environ.get("ACTUATOR_BACKEND", "pyautogui")
+# Maximum cursor moves per second sent to the OS
+MOVE_RATE = float(os.environ.get("ACTUATOR_MOVE_RATE", "60"))
+# Default minimum seconds between two discrete actions of the same name
+DEBOUNCE = 0.3
+# At most this many discrete actions wait in the queue; older ones are dropped
+MAX_QUEUE = 16
+
+
+class PyAutoGUIBackend:
+    """Sends actions to the OS through pyautogui (imported on first use)."""
+
+    def __init__(self):
+        import pyautogui
+        self._gui = pyautogui
+
+    def size(self):
+        return self._gui.size()
+
+    def position(self):
+        return self._gui.position()
+
+    def move(self, x, y):
+        # No duration: a tweened move would block the actuator for its length
+        self._gui.moveTo(x, y)
+
+    def click(self):
+        self._gui.click()
+
+    def double_click(self):
+        self._gui.doubleClick()
+
+    def mouse_down(self):
+        self._gui.mouseDown()
+
+    def mouse_up(self):
+        self._gui.mouseUp()
+
+    def hotkey(self, *keys):
+        self._gui.hotkey(*keys)
+
+    def screenshot(self, path=None):
+        self._gui.screenshot().save(path or f'screenshot_{int(time.time())}.png')
+
+
+class RecordingBackend:
+    """No-op backend that records every call, for benchmarks and headless runs."""
+
+    def __init__(self, size=(1920, 1080)):
+        self._size = size
+        self._position = (size[0] // 2, size[1] // 2)
+        self.calls = []
+
+    def size(self):
+        return self._size
+
+    def position(self):
+        return self._position
+
+    def move(self, x, y):
+        self._position = (x, y)
+        self.calls.append(("move", (x, y)))
+
+    def click(self):
+        self.calls.append(("click", ()))
+
+    def double_click(self):
+        self.calls.append(("double_click", ()))
+
+    def mouse_down(self):
+        self.calls.append(("mouse_down", ()))
+
+    def mouse_up(self):
+        self.calls.append(("mouse_up", ()))
+
+    def hotkey(self, *keys):
+        self.calls.append(("hotkey", keys))
+
+    def screenshot(self, path=None):
+        self.calls.append(("screenshot", (path,)))
+
+    def counts(self):
+        """Number of calls per backend method."""
+        counts = {}
+        for name, _ in self.calls:
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+
+BACKENDS = {"pyautogui": PyAutoGUIBackend, "recording": RecordingBackend}
+
+
+class Actuator:
+    """
+    Perform OS input actions on a background thread so vision loops never wait on them.
+
+    Cursor moves are latest-wins: move_to() only replaces the pending target,
+    and the thread applies at most `move_rate` moves per second. Discrete
+    actions (click, hotkey, screenshot) go through a queue, and an action is
+    dropped if the same action was queued less than its debounce ago.
+    """
+
+    def __init__(self, backend=None, move_rate=MOVE_RATE, debounce=DEBOUNCE):
+        self.backend = backend if backend is not None else BACKENDS[ACTUATOR_BACKEND]()
+        self.move_interval = 1.0 / move_rate if move_rate > 0 else 0.0
+        self.debounce = debounce
+        self.coalesced_moves = 0
+        self.debounced = 0
+        self._target = None
+        self._actions = deque(maxlen=MAX_QUEUE)
+        self._last_queued = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="actuator", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        """Stop the thread after it has performed what is already queued."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+
+    def move_to(self, x, y, pipeline="actuator"):
+        """Set the cursor target; a target not yet applied is replaced."""
+        with self._cond:
+            if self._target is not None:
+                self.coalesced_moves += 1
+            self._target = ((x, y), pipeline)
+            self._cond.notify()
+        self.start()
+
+    def trigger(self, name, *args, pipeline="actuator", debounce=None):
+        """
+        Queue the discrete action `name` ("click", "double_click", "mouse_down",
+        "mouse_up", "hotkey", "screenshot") with backend arguments `args`. Returns False if it was
+        debounced.
+        """
+        now = time.monotonic()
+        debounce = self.debounce if debounce is None else debounce
+        key = (name, args)
+        with self._cond:
+            if now - self._last_queued.get(key, float("-inf")) < debounce:
+                self.debounced += 1
+                return False
+            self._last_queued[key] = now
+            self._actions.append((name, args, pipeline))
+            self._cond.notify()
+        self.start()
+        return True
+
+    def _run(self):
+        last_move = 0.0
+        while True:
+            with self._cond:
+                while True:
+                    if self._actions:
+                        work = self._actions.popleft()
+                        break
+                    wait = last_move + self.move_interval - time.monotonic()
+                    if self._target is not None and wait <= 0:
+                        work, self._target = ("move",) + self._target, None
+                        last_move = time.monotonic()
+                        break
+                    if not self._running:
+                        return
+                    self._cond.wait(wait if self._target is not None else None)
+            name, args, pipeline = work
+            try:
+                getattr(self.backend, name)(*args)
+            except Exception as e:
+                logging.warning(f"Actuator {name} failed: {e}")
+                continue
+            ACTIONS.labels(pipeline, "move_cursor" if name == "move" else name).inc()
+
+
+_actuator = None
+
+
+def get_actuator():
+    """Return the process-wide actuator (backend set by ACTUATOR_BACKEND)."""
+    global _actuator
+    if _actuator is None:
+        _actuator = Actuator()
+        atexit.register(_actuator.stop)
+    return _actuator
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark: entities.EntityStore vs the old per-entity lists.
+
+Each tick moves every asteroid, tests it against the character box and
+removes the ones that fell off the screen, respawning as many so the
+population stays at --entities. The hit-test part resolves --points gaze
+samples per tick against balloon boxes, one linear scan per point versus a
+single SpatialGrid query for the whole batch.
+
+    python bench_entities.py --entities 10 100 1000 5000 --ticks 2000 --points 60
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from entities import EntityStore, SpatialGrid
+
+SPEED = 240.0
+DT = 1.0 / 30
+CHAR_X = 340
+
+
+def legacy_tick(asteroids):
+    """The original gesturegame loop body over [x, y] lists (without drawing)."""
+    hit = False
+    for asteroid in asteroids[:]:
+        asteroid[1] += SPEED * DT
+        if asteroid[1] > 480 and CHAR_X < asteroid[0] < CHAR_X + 120:
+            hit = True
+        if asteroid[1] > 600:
+            asteroids.remove(asteroid)
+            asteroids.append([random.randint(50, 750), 0])
+    return hit
+
+
+def store_tick(store):
+    store.step(DT)
+    hit = store.points_inside(CHAR_X, 480, CHAR_X + 120, float("inf")).any()
+    gone = store.kill(store.positions[:, 1] > 600)
+    if gone:
+        store.compact()
+        store.spawn(np.column_stack([np.random.randint(50, 751, gone), np.zeros(gone)]), (0, SPEED), (100, 100))
+    return hit
+
+
+def linear_hits(state):
+    store, points = state
+    for x, y in points.tolist():
+        store.boxes_containing(x, y)
+
+
+def grid_hits(state):
+    store, grid, points = state
+    store.step(DT)
+    grid.update()
+    grid.query(points)
+
+
+def run(label, tick, state, ticks):
+    times = np.empty(ticks)
+    for i in range(ticks):
+        started = time.perf_counter()
+        tick(state)
+        times[i] = time.perf_counter() - started
+    times *= 1e6
+    print(f"  {label:<14} mean {times.mean():9.1f} us  p99 {np.percentile(times, 99):9.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--ticks", type=int, default=2000)
+    parser.add_argument("--points", type=int, default=60, help="gaze samples hit-tested per tick")
+    args = parser.parse_args()
+
+    for count in args.entities:
+        # Spread the asteroids over the screen height so some leave every tick
+        start = [[random.randint(50, 750), random.uniform(0, 600)] for _ in range(count)]
+        store = EntityStore()
+        store.spawn(np.array(start), (0, SPEED), (100, 100))
+        print(f"{count} entities, {args.ticks} ticks")
+        run("lists", legacy_tick, [list(a) for a in start], args.ticks)
+        run("EntityStore", store_tick, store, args.ticks)
+
+        # Balloons spread over a screen that grows with the population
+        side = 800 * max(1.0, (count / 50) ** 0.5)
+        balloons = EntityStore()
+        balloons.spawn(np.random.uniform(0, side, (count, 2)), (0, -60), (150, 170))
+        grid = SpatialGrid(balloons)
+        grid.update()
+        points = np.random.uniform(0, side, (args.points, 2))
+        run("linear hits", linear_hits, (balloons, points), args.ticks)
+        run("grid hits", grid_hits, (balloons, grid, points), args.ticks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark the game simulations (and optionally rendering) without a display.
+
+Runs gesturegame's and eyegame's fixed-timestep step() as fast as possible
+for a number of ticks and reports the per-tick cost against the 1 / TICK_RATE
+budget. With --render the games also draw every tick through pygame's dummy
+SDL video driver, so simulation and rendering cost are reported separately.
+
+    python bench_games.py --ticks 10000
+    python bench_games.py --ticks 2000 --render
+"""
+import argparse
+import json
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=10000, help="simulation ticks per game")
+    parser.add_argument("--render", action="store_true", help="also draw each tick off-screen")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.render:
+        os.environ["GAME_HEADLESS"] = "0"
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    else:
+        os.environ["GAME_HEADLESS"] = "1"
+    import eyegame
+    import gesturegame
+    from engine import GameLoop
+
+    results = {}
+    for module in (gesturegame, eyegame):
+        name = module.__name__
+        if args.render:
+            module.load_assets()
+        # Keep simulating after a game over so every run covers the same number of ticks
+        loop = GameLoop(name, module.step, module.render if args.render else None, profile=True)
+        loop.run(max_ticks=args.ticks, realtime=False)
+        results[name] = loop.report()
+        stages = results[name]["stages"]
+        print(f"{name}: {args.ticks} ticks, budget {results[name]['budget_ms']} ms per tick")
+        for stage, stats in stages.items():
+            share = stats["mean_ms"] / results[name]["budget_ms"]
+            print(f"  {stage:<8} mean {stats['mean_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  ({share:.2%} of budget)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
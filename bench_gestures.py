@@ -0,0 +1,83 @@
+"""
+Micro-benchmark: gesture table classifier vs the old per-landmark if/elif chain,
+and the full GestureRecognizer (poses plus motion gestures over the per-hand
+history) on hands drifting smoothly at 30 fps, with short and long histories.
+
+    python bench_gestures.py --hands 2 --frames 20000
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from gestures import GestureClassifier, GestureRecognizer
+
+
+def legacy_classify(hands):
+    """The original hand.py chain over landmark attributes (poses only, no cooldowns)."""
+    names = []
+    for landmarks in hands:
+        index_tip, middle_tip, ring_tip, pinky_tip = landmarks[8], landmarks[12], landmarks[16], landmarks[20]
+        palm_base = landmarks[0]
+        fingers = [index_tip, middle_tip, ring_tip, pinky_tip]
+        if all(f.y < palm_base.y for f in fingers):
+            names.append("brightness_up")
+        elif all(f.y > palm_base.y for f in fingers):
+            names.append("brightness_down")
+        elif index_tip.y < palm_base.y and middle_tip.y < palm_base.y:
+            names.append("move_cursor")
+        elif all(f.y < palm_base.y for f in [middle_tip, ring_tip, pinky_tip]) and index_tip.y > palm_base.y:
+            names.append("screenshot")
+        elif abs(index_tip.y - middle_tip.y) < 0.02:
+            names.append("double_click")
+        else:
+            names.append(None)
+    return names
+
+
+def run_recognizer(label, recognizer, frames):
+    start = time.perf_counter()
+    for i, frame in enumerate(frames):
+        recognizer.update(frame, i / 30)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / len(frames) * 1e6:8.2f} us/frame")
+
+
+def run(label, fn, frames):
+    start = time.perf_counter()
+    for frame in frames:
+        fn(frame)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / len(frames) * 1e6:8.2f} us/frame")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hands", type=int, default=2, help="hands per frame")
+    parser.add_argument("--frames", type=int, default=20000, help="frames to classify")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    arrays = rng.random((args.frames, args.hands, 21, 3), dtype=np.float32)
+    objects = [
+        [[SimpleNamespace(x=x, y=y, z=z) for x, y, z in hand.tolist()] for hand in frame]
+        for frame in arrays
+    ]
+    classifier = GestureClassifier()
+
+    print(f"{args.frames} frames, {args.hands} hands per frame")
+    run("legacy if/elif chain", legacy_classify, objects)
+    run("gesture table (vectorized)", classifier.classify, arrays)
+    run("gesture table + cooldowns", lambda frame: classifier.update(frame, time.time()), arrays)
+
+    # Hands that move a little every frame, so they keep their history slots
+    hands = rng.random((args.hands, 21, 3), dtype=np.float32) * 0.2 + np.linspace(0.1, 0.6, args.hands)[:, None, None]
+    drift = np.cumsum(rng.normal(0, 0.004, (args.frames, args.hands, 1, 3)), axis=0).astype(np.float32)
+    moving = hands + drift
+    run_recognizer("recognizer, 32 frames", GestureRecognizer(max_hands=args.hands), moving)
+    run_recognizer("recognizer, 1024 frames", GestureRecognizer(max_hands=args.hands, capacity=1024), moving)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+Load test of one API worker: /ws/tracking clients plus /start and /terminate churn.
+
+Unless --url points at a running server, starts `uvicorn main:app` on a free
+localhost port (recording actuator, headless games). It then starts the
+tracking program on synthetic frames and, for each --clients step, opens that
+many /ws/tracking clients doing the "program" handshake for --duration
+seconds, while --churn sessions start and terminate a program in a loop and
+/health is probed four times per second. Every --interval seconds it prints
+messages/s, message latency percentiles, /health latency, errors and the CPU
+and RSS of the server process and its children (tracking host, games).
+
+Message latency is receive time minus the capture time of the newest frame
+in the message ("hand_timestamp" / "eye_timestamp"), so it covers inference,
+the pipeline, forwarding from the tracking host, the bus and the socket. The
+send latency, from the message's own "timestamp" to receipt, is reported
+alongside it. Client and server share a clock because both run on this host.
+
+Needs the dev dependencies (pip install -r requirements-dev.txt).
+
+    python bench_load.py --clients 1 10 50 --duration 20
+    python bench_load.py --clients 10 50 --output load.json
+    python bench_load.py --clients 10 50 --baseline load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+import websockets
+
+from supervisor import read_proc
+
+HEALTH_INTERVAL = 0.25
+
+
+class Recorder:
+    """Samples of the current reporting interval, and of the whole step."""
+
+    def __init__(self):
+        self.interval = self._empty()
+        self.step = self._empty()
+
+    @staticmethod
+    def _empty():
+        return {"latency": [], "send": [], "messages": 0, "health": [], "rest": {}, "errors": {}, "connects": []}
+
+    def _add(self, key, value):
+        for sample in (self.interval, self.step):
+            sample[key].append(value)
+
+    def message(self, latency, send):
+        if latency is not None:
+            self._add("latency", latency)
+        self._add("send", send)
+        self.interval["messages"] += 1
+        self.step["messages"] += 1
+
+    def health(self, latency):
+        self._add("health", latency)
+
+    def connect(self, latency):
+        self._add("connects", latency)
+
+    def rest(self, endpoint, latency):
+        for sample in (self.interval, self.step):
+            sample["rest"].setdefault(endpoint, []).append(latency)
+
+    def error(self, kind):
+        for sample in (self.interval, self.step):
+            sample["errors"][kind] = sample["errors"].get(kind, 0) + 1
+
+    def take_interval(self):
+        interval, self.interval = self.interval, self._empty()
+        return interval
+
+
+def percentiles(values):
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    p50, p95, p99 = np.percentile(np.array(values) * 1000.0, (50, 95, 99))
+    return {"p50_ms": round(p50, 2), "p95_ms": round(p95, 2), "p99_ms": round(p99, 2)}
+
+
+def _descendants(pid):
+    """pid and all its child processes, from /proc/<pid>/task/*/children."""
+    pids = [pid]
+    for current in pids:
+        try:
+            tasks = os.listdir(f"/proc/{current}/task")
+        except OSError:
+            continue
+        for task in tasks:
+            try:
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+            except OSError:
+                pass
+    return pids
+
+
+class ProcessSampler:
+    """CPU share and RSS of the server process, alone and with its children."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self._last = None
+
+    def sample(self):
+        if self.pid is None:
+            return {}
+        now = time.monotonic()
+        usage = {}
+        for pid in _descendants(self.pid):
+            rss, cpu = read_proc(pid)
+            if rss is not None:
+                usage[pid] = (rss, cpu)
+        if self.pid not in usage:
+            return {}
+        cpu = {"server": usage[self.pid][1], "total": sum(c for _, c in usage.values())}
+        result = {
+            "server_rss_mb": usage[self.pid][0],
+            "total_rss_mb": round(sum(r for r, _ in usage.values()), 1),
+            "processes": len(usage),
+        }
+        if self._last is not None:
+            elapsed = now - self._last[0]
+            for key in ("server", "total"):
+                # Children that exited since the last sample can make the total go down
+                result[f"{key}_cpu_percent"] = round(max(0.0, cpu[key] - self._last[1][key]) / elapsed * 100, 1)
+        self._last = (now, cpu)
+        return result
+
+
+async def ws_client(url, program, max_hz, recorder, stop):
+    started = time.perf_counter()
+    try:
+        async with websockets.connect(url, open_timeout=10) as ws:
+            await ws.send(json.dumps({"program": program, "max_hz": max_hz}))
+            recorder.connect(time.perf_counter() - started)
+            while not stop.is_set():
+                try:
+                    data = await asyncio.wait_for(ws.recv(), 1.0)
+                except asyncio.TimeoutError:
+                    continue
+                received = time.time()
+                message = json.loads(data)
+                captured = [message[key] for key in ("hand_timestamp", "eye_timestamp") if key in message]
+                recorder.message(received - max(captured) if captured else None, received - message["timestamp"])
+    except Exception as e:
+        recorder.error(f"ws {type(e).__name__}")
+
+
+async def timed_request(http, recorder, method, path, endpoint, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await http.request(method, path, **kwargs)
+    except httpx.HTTPError as e:
+        recorder.error(f"{endpoint} {type(e).__name__}")
+        return None
+    recorder.rest(endpoint, time.perf_counter() - started)
+    if response.status_code >= 400:
+        recorder.error(f"{endpoint} {response.status_code}")
+        return None
+    return response
+
+
+async def churn(http, program, source, rate, recorder, stop):
+    """Start the program in a new session, terminate it and close the session, `rate` times a second."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await timed_request(http, recorder, "POST", "/start", "start", json={"program": program, "source": source})
+        if response is not None:
+            session = response.json()["session"]
+            await timed_request(http, recorder, "POST", "/terminate", "terminate", json={"program": program, "session": session})
+            await timed_request(http, recorder, "DELETE", f"/sessions/{session}", "close")
+        delay = 1.0 / rate - (time.perf_counter() - started)
+        if delay > 0:
+            try:
+                await asyncio.wait_for(stop.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def probe_health(http, recorder, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            response = await http.get("/health")
+            if response.status_code == 200:
+                recorder.health(time.perf_counter() - started)
+            else:
+                recorder.error(f"health {response.status_code}")
+        except httpx.HTTPError as e:
+            recorder.error(f"health {type(e).__name__}")
+        try:
+            await asyncio.wait_for(stop.wait(), HEALTH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def summarize(sample, elapsed, clients, usage):
+    summary = {
+        "clients": clients,
+        "messages": sample["messages"],
+        "messages_per_second": round(sample["messages"] / elapsed, 1),
+        "latency": percentiles(sample["latency"]),
+        "send": percentiles(sample["send"]),
+        "health": percentiles(sample["health"]),
+        "connect": percentiles(sample["connects"]),
+        "rest": {endpoint: percentiles(values) for endpoint, values in sample["rest"].items()},
+        "errors": sample["errors"],
+    }
+    if usage:
+        summary["cpu_percent"] = {
+            "server_mean": round(float(np.mean([u.get("server_cpu_percent", 0) for u in usage])), 1),
+            "total_mean": round(float(np.mean([u.get("total_cpu_percent", 0) for u in usage])), 1),
+            "total_max": max(u.get("total_cpu_percent", 0) for u in usage),
+        }
+        summary["rss_mb"] = {
+            "server_max": max(u["server_rss_mb"] for u in usage),
+            "total_max": max(u["total_rss_mb"] for u in usage),
+        }
+    return summary
+
+
+def print_interval(clients, second, sample, interval, usage):
+    latency = percentiles(sample["latency"])
+    send = percentiles(sample["send"])
+    health = percentiles(sample["health"])
+    errors = sum(sample["errors"].values())
+    cpu = usage.get("total_cpu_percent", "-")
+    rss = usage.get("total_rss_mb", "-")
+    print(
+        f"  {clients:>4} clients {second:>5.0f}s  {sample['messages'] / interval:>8.1f} msg/s"
+        f"  latency p50 {latency['p50_ms']} p99 {latency['p99_ms']} ms (send p99 {send['p99_ms']} ms)"
+        f"  health p99 {health['p99_ms']} ms  errors {errors}  cpu {cpu}%  rss {rss} MB"
+    )
+
+
+async def run_step(args, base_url, clients, sampler):
+    ws_url = base_url.replace("http", "ws", 1) + "/ws/tracking"
+    recorder = Recorder()
+    stop = asyncio.Event()
+    usage = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+        tasks = [asyncio.ensure_future(probe_health(http, recorder, stop))]
+        tasks += [asyncio.ensure_future(churn(http, args.churn_program, args.source, args.churn_rate, recorder, stop))
+                  for _ in range(args.churn)]
+        tasks += [asyncio.ensure_future(ws_client(ws_url, args.program, args.max_hz, recorder, stop))
+                  for _ in range(clients)]
+        sampler.sample()
+        started = time.perf_counter()
+        while time.perf_counter() - started < args.duration:
+            await asyncio.sleep(min(args.interval, args.duration - (time.perf_counter() - started)))
+            sample = sampler.sample()
+            if sample:
+                usage.append(sample)
+            print_interval(clients, time.perf_counter() - started, recorder.take_interval(), args.interval, sample)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*tasks)
+    return summarize(recorder.step, elapsed, clients, usage)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    env = dict(os.environ, ACTUATOR_BACKEND="recording", GAME_HEADLESS="1", FRAME_SOURCE="synthetic")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+
+async def wait_ready(base_url, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        while time.monotonic() < deadline:
+            try:
+                if (await http.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready within {timeout}s")
+
+
+async def run(args, base_url, pid):
+    await wait_ready(base_url)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        response = await http.post("/start", json={"program": args.program, "source": args.source})
+        response.raise_for_status()
+        session = response.json()["session"]
+        # Let the pipeline load its models before measuring
+        await asyncio.sleep(args.settle)
+    sampler = ProcessSampler(pid)
+    steps = []
+    try:
+        for clients in args.clients:
+            steps.append(await run_step(args, base_url, clients, sampler))
+    finally:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+            await http.delete(f"/sessions/{session}")
+    return {"program": args.program, "duration": args.duration, "churn": args.churn, "churn_rate": args.churn_rate, "steps": steps}
+
+
+def print_report(result):
+    print(f"{result['program']}: {result['duration']}s per step, {result['churn']} churn sessions")
+    print(f"  {'clients':>7}{'msg/s':>10}{'msg/s/client':>14}{'p50 ms':>9}{'p99 ms':>9}{'health p99':>12}{'errors':>8}{'cpu %':>8}{'rss MB':>9}")
+    for step in result["steps"]:
+        per_client = step["messages_per_second"] / max(step["clients"], 1)
+        print(
+            f"  {step['clients']:>7}{step['messages_per_second']:>10}{per_client:>14.1f}"
+            f"{str(step['latency']['p50_ms']):>9}{str(step['latency']['p99_ms']):>9}{str(step['health']['p99_ms']):>12}"
+            f"{sum(step['errors'].values()):>8}{step.get('cpu_percent', {}).get('total_mean', '-'):>8}"
+            f"{step.get('rss_mb', {}).get('total_max', '-'):>9}"
+        )
+
+
+def compare(result, baseline, tolerance, min_delta_ms):
+    """
+    Regressions of `result` against `baseline`, per step with the same number
+    of clients: fewer messages per second, higher message or /health p99
+    latency (by `tolerance` and `min_delta_ms`), or errors where there were none.
+    """
+    regressions = []
+    reference = {step["clients"]: step for step in baseline["steps"]}
+    for step in result["steps"]:
+        base = reference.get(step["clients"])
+        if base is None:
+            continue
+        label = f"{step['clients']} clients"
+        if step["messages_per_second"] < base["messages_per_second"] * (1 - tolerance):
+            regressions.append(f"{label}: {step['messages_per_second']} msg/s < baseline {base['messages_per_second']}")
+        for key in ("latency", "health"):
+            now, then = step[key]["p99_ms"], base[key]["p99_ms"]
+            if now is not None and then is not None and now > then * (1 + tolerance) and now - then > min_delta_ms:
+                regressions.append(f"{label}: {key} p99 {now} ms > baseline {then} ms")
+        errors, base_errors = sum(step["errors"].values()), sum(base["errors"].values())
+        if errors > base_errors:
+            regressions.append(f"{label}: {errors} errors > baseline {base_errors}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="test a running server (default: start one on a free local port)")
+    parser.add_argument("--pid", type=int, help="server pid for CPU/RSS sampling with --url")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50], help="concurrent WebSocket clients per step")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per step")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between progress lines")
+    parser.add_argument("--program", default="hand_tracking_control", help="tracking program the clients follow")
+    parser.add_argument("--source", default="synthetic", help="frame source of the tracking program")
+    parser.add_argument("--max-hz", type=float, default=0, help="max_hz sent in the handshake (0 = camera rate)")
+    parser.add_argument("--churn", type=int, default=1, help="sessions starting and terminating programs")
+    parser.add_argument("--churn-rate", type=float, default=1.0, help="start/terminate cycles per second per churn session")
+    parser.add_argument("--churn-program", default="eye_tracking_game",
+                        help="program the churn sessions start and terminate; must differ from --program")
+    parser.add_argument("--settle", type=float, default=5.0, help="seconds to let the program warm up before measuring")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="ignore latency increases smaller than this")
+    args = parser.parse_args()
+    if args.churn and args.churn_program == args.program:
+        # Starting the program the clients follow only joins it, so nothing would churn
+        parser.error("--churn-program must differ from --program")
+
+    server = None
+    if args.url:
+        base_url, pid = args.url.rstrip("/"), args.pid
+    else:
+        port = free_port()
+        server = start_server(port)
+        base_url, pid = f"http://127.0.0.1:{port}", server.pid
+    try:
+        result = asyncio.run(run(args, base_url, pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
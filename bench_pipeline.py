@@ -0,0 +1,119 @@
+"""
+Per-stage benchmark of the hand and eye pipelines, run offline.
+
+Drives hand, eye or combined process_frames() from a recorded video
+(or synthetic frames), times every stage plus JPEG encoding, and reports
+throughput and p50/p99 latency. The actuator uses the recording backend, so
+no display is needed and no OS input is generated.
+
+    python bench_pipeline.py --pipeline hand --video session.mp4 --output run.json
+    python bench_pipeline.py --pipeline hand --video session.mp4 --baseline run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+
+async def run_pipeline(module, grabber, frames, warmup):
+    from encoding import JpegEncoder
+
+    encoder = JpegEncoder()
+    timer = module.timer
+    timer.enabled = True
+    count = 0
+    pipeline = module.process_frames()
+    try:
+        async for frame in pipeline:
+            encoder.encode(frame)
+            timer.lap("encode")
+            timer.end()
+            count += 1
+            if count == warmup:
+                timer.reset()
+            if frames and count >= frames + warmup:
+                break
+    finally:
+        await pipeline.aclose()
+        grabber.stop()
+    return timer.summary()
+
+
+def compare(result, baseline, tolerance, min_delta_ms):
+    """
+    Return a list of regressions of `result` against `baseline`. A stage only
+    regresses if it is both `tolerance` slower and `min_delta_ms` slower, so
+    sub-millisecond jitter in cheap stages is not reported.
+    """
+    regressions = []
+    if result["fps"] < baseline["fps"] * (1 - tolerance):
+        regressions.append(f"fps {result['fps']} < baseline {baseline['fps']}")
+    for stage, stats in result["stages"].items():
+        reference = baseline["stages"].get(stage)
+        if reference is None:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            if stats[key] > reference[key] * (1 + tolerance) and stats[key] - reference[key] > min_delta_ms:
+                regressions.append(f"{stage} {key} {stats[key]} > baseline {reference[key]}")
+    return regressions
+
+
+def print_report(result):
+    print(f"{result['pipeline']} pipeline: {result['fps']} fps")
+    print(f"  {'stage':<12}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<12}{stats['count']:>8}{stats['mean_ms']:>10}{stats['p50_ms']:>10}{stats['p99_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipeline", choices=("hand", "eye", "combined"), default="hand")
+    parser.add_argument("--video", help="recorded video to replay (default: synthetic frames)")
+    parser.add_argument("--frames", type=int, default=300, help="frames to measure (0 = whole video)")
+    parser.add_argument("--warmup", type=int, default=10, help="frames to discard first")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore stage slowdowns smaller than this")
+    args = parser.parse_args()
+
+    os.environ["ACTUATOR_BACKEND"] = "recording"
+    if args.pipeline == "hand":
+        import hand as module
+        grabber = module.cap
+    elif args.pipeline == "eye":
+        import eye as module
+        grabber = module.cam
+    else:
+        import combined as module
+        grabber = module.cam
+    if args.video:
+        grabber.configure({"type": "file", "path": args.video, "pace": "fast"})
+    else:
+        grabber.configure({"type": "synthetic", "pace": "fast"})
+
+    result = asyncio.run(run_pipeline(module, grabber, args.frames, args.warmup))
+    module.actuator.stop()
+    result["actions"] = module.actuator.backend.counts()
+    trackers = getattr(module, "trackers", None) or (module.tracker,)
+    result["tracker"] = {tracker.key: tracker.stats() for tracker in trackers}
+    print_report(result)
+    print(f"  detect/track: {result['tracker']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import numpy as np
+
+# Face mesh contour points per eye, in eye-aspect-ratio order:
+# outer corner, two upper lid points, inner corner, two lower lid points
+EYE_POINTS = np.array([
+    [33, 160, 158, 133, 153, 144],
+    [362, 385, 387, 263, 373, 380],
+])
+
+# Hysteresis thresholds on the eye aspect ratio: an eye counts as closed below
+# CLOSED_EAR and as open again only above OPEN_EAR
+CLOSED_EAR = 0.18
+OPEN_EAR = 0.24
+# Seconds after a click during which no further click is emitted
+REFRACTORY = 1.0
+
+
+def eye_aspect_ratio(landmarks, frame_shape):
+    """
+    Eye aspect ratio of both eyes, (|p2-p6| + |p3-p5|) / (2 |p1-p4|), from
+    one face's (478, 3) landmark array. Returns a length-2 array.
+    """
+    height, width = frame_shape[:2]
+    points = landmarks[EYE_POINTS, :2] * (width, height)
+    vertical = np.linalg.norm(points[:, [1, 2]] - points[:, [5, 4]], axis=-1).sum(axis=1)
+    horizontal = np.linalg.norm(points[:, 0] - points[:, 3], axis=-1)
+    return vertical / (2 * np.maximum(horizontal, 1e-6))
+
+
+class BlinkDetector:
+    """
+    Blink-to-click state machine for one stream.
+
+    Both eyes have to close (EAR below `closed`) to start a blink, and they
+    count as open again only once the EAR rises above `opened`. A click is
+    emitted when a blink starts, unless the last click was less than
+    `refractory` seconds ago. update() never waits, so the caller keeps
+    tracking at full rate.
+    """
+
+    def __init__(self, closed=CLOSED_EAR, opened=OPEN_EAR, refractory=REFRACTORY):
+        self.closed = closed
+        self.opened = opened
+        self.refractory = refractory
+        self.eyes_closed = False
+        self.ear = None
+        self._last_click = float("-inf")
+
+    def update(self, landmarks, frame_shape, now):
+        """Feed one face's landmarks; returns True when a click should be issued."""
+        self.ear = eye_aspect_ratio(landmarks, frame_shape)
+        if self.eyes_closed:
+            if self.ear.min() > self.opened:
+                self.eyes_closed = False
+            return False
+        if self.ear.max() >= self.closed:
+            return False
+        self.eyes_closed = True
+        if now - self._last_click < self.refractory:
+            return False
+        self._last_click = now
+        return True
+
+    def reset(self):
+        """Forget the eye state, e.g. when the face is lost."""
+        self.eyes_closed = False
+        self.ear = None
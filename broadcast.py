@@ -0,0 +1,120 @@
+import asyncio
+import logging
+
+from encoding import JpegEncoder
+from metrics import MJPEG_DROPPED_FRAMES, MJPEG_VIEWERS
+
+logging.basicConfig(level=logging.INFO)
+
+MJPEG_MEDIA_TYPE = "multipart/x-mixed-replace; boundary=frame"
+
+
+MJPEG_PART_HEADER = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+
+
+def mjpeg_chunk(jpeg_bytes):
+    """Wrap one JPEG image (any bytes-like buffer) as a part of a multipart/x-mixed-replace stream."""
+    return b"".join((MJPEG_PART_HEADER, jpeg_bytes, b"\r\n"))
+
+
+class FrameHub:
+    """
+    Run a single frame pipeline and fan its output out to many viewers.
+
+    `produce` is an async generator function yielding annotated BGR frames.
+    It runs once no matter how many viewers are connected; each frame is
+    JPEG-encoded once and offered to every subscriber's bounded queue, where
+    the oldest frame is dropped if a slow client has not caught up. The
+    pipeline runs while there are viewers, or until stop() after start();
+    frames produced with nobody watching are not encoded at all.
+    """
+
+    def __init__(self, produce, queue_size=2, encoder=None):
+        self._produce = produce
+        self.queue_size = queue_size
+        self.encoder = encoder or JpegEncoder()
+        self._subscribers = set()
+        self._task = None
+        self._pinned = False
+        self.dropped = 0
+
+    @property
+    def viewers(self):
+        return len(self._subscribers)
+
+    def _ensure_running(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def start(self):
+        """Keep the pipeline running even when nobody is watching."""
+        self._pinned = True
+        self._ensure_running()
+
+    def stop(self):
+        """Undo start(); the pipeline stops now unless viewers are connected."""
+        self._pinned = False
+        if self._task is not None and not self._subscribers:
+            self._task.cancel()
+            self._task = None
+
+    def subscribe(self):
+        """Register a viewer and make sure the pipeline is running."""
+        subscriber = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(subscriber)
+        MJPEG_VIEWERS.inc()
+        self._ensure_running()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        if subscriber in self._subscribers:
+            self._subscribers.discard(subscriber)
+            MJPEG_VIEWERS.dec()
+
+    async def stream(self):
+        """Async generator of multipart MJPEG chunks for one viewer."""
+        subscriber = self.subscribe()
+        try:
+            while True:
+                chunk = await subscriber.get()
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _offer(self, subscriber, chunk):
+        """Queue a chunk for one viewer; returns True if an older chunk had to be dropped."""
+        dropped = subscriber.full()
+        if dropped:
+            subscriber.get_nowait()
+            self.dropped += 1
+            MJPEG_DROPPED_FRAMES.inc()
+        subscriber.put_nowait(chunk)
+        return dropped
+
+    async def _run(self):
+        frames = self._produce()
+        try:
+            async for frame in frames:
+                if not self._subscribers:
+                    if self._pinned:
+                        continue
+                    # Last viewer left; a new subscriber will start a fresh pipeline
+                    self._task = None
+                    return
+                buffer = await asyncio.to_thread(self.encoder.encode, frame)
+                if buffer is None:
+                    continue
+                chunk = mjpeg_chunk(buffer)
+                subscribers = list(self._subscribers)
+                dropped = sum(self._offer(subscriber, chunk) for subscriber in subscribers)
+                self.encoder.report_drops(dropped, len(subscribers))
+        except Exception as e:
+            logging.error(f"Frame pipeline failed: {e}")
+        finally:
+            await frames.aclose()
+        # The pipeline ended on its own; wake the viewers so their responses finish
+        self._task = None
+        for subscriber in list(self._subscribers):
+            self._offer(subscriber, None)
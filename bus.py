@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from collections import namedtuple
+
+from metrics import BUS_COALESCED
+
+logging.basicConfig(level=logging.INFO)
+
+# One pipeline result: `source` is "hand" or "eye", `landmarks` a float32
+# (n, points, 3) array in normalized image coordinates, `gestures` a list of names
+TrackingUpdate = namedtuple("TrackingUpdate", ["source", "seq", "timestamp", "landmarks", "gestures"])
+
+# Which pipeline outputs each program's clients are interested in
+PROGRAM_SOURCES = {
+    "eye_tracking_control": {"eye"},
+    "eye_tracking_game": {"eye"},
+    "hand_tracking_control": {"hand"},
+    "hand_tracking_game": {"hand"},
+    "gaze_gesture_control": {"eye", "hand"},
+}
+
+
+class Subscription:
+    """
+    Mailbox for one consumer that keeps only the newest unsent update per source.
+
+    A consumer that is slower than the pipeline never builds a backlog: updates
+    that arrive while it is busy replace each other and are counted as coalesced.
+    """
+
+    def __init__(self, sources=None):
+        self.sources = sources
+        self.coalesced = 0
+        self._pending = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, update):
+        if self.sources is not None and update.source not in self.sources:
+            return
+        if update.source in self._pending:
+            self.coalesced += 1
+            BUS_COALESCED.inc()
+        self._pending[update.source] = update
+        self._ready.set()
+
+    async def get(self):
+        """Wait for and return the latest pending update of each source."""
+        await self._ready.wait()
+        self._ready.clear()
+        updates, self._pending = self._pending, {}
+        return list(updates.values())
+
+
+class TrackingBus:
+    """In-process pub/sub bus carrying pipeline results to WebSocket clients."""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._loop = None
+        self._taps = []
+
+    def subscribe(self, sources=None):
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(sources)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscriptions.discard(subscription)
+
+    def add_tap(self, tap):
+        """Call tap(update) synchronously for every update published, before any coalescing."""
+        self._taps.append(tap)
+
+    def remove_tap(self, tap):
+        if tap in self._taps:
+            self._taps.remove(tap)
+
+    def pending(self):
+        """Number of updates waiting in all subscriptions."""
+        return sum(len(subscription._pending) for subscription in self._subscriptions)
+
+    def publish(self, update):
+        """Deliver an update to every subscriber; safe to call from any thread."""
+        for tap in self._taps:
+            tap(update)
+        if not self._subscriptions:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(update)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._deliver, update)
+
+    def _deliver(self, update):
+        for subscription in list(self._subscriptions):
+            subscription.offer(update)
+
+
+bus = TrackingBus()
@@ -0,0 +1,148 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+from metrics import CAPTURED_FRAMES, DROPPED_CAPTURE_FRAMES
+from registry import ResourceCache
+from sources import DEFAULT_SOURCE, create_source, parse_source
+
+logging.basicConfig(level=logging.INFO)
+
+# A captured frame together with its capture sequence number and timestamp
+Frame = namedtuple("Frame", ["image", "seq", "timestamp"])
+
+# Webcams stay open this long after their grabber stops, so restarting or
+# switching programs does not pay for opening the device again (0 closes at once)
+CAPTURE_IDLE_TIMEOUT = float(os.environ.get("CAPTURE_IDLE_TIMEOUT", "5"))
+WEBCAMS = ResourceCache("webcam", create_source, lambda source: source.release(), CAPTURE_IDLE_TIMEOUT)
+atexit.register(WEBCAMS.clear)
+
+
+class FrameGrabber:
+    """
+    Read frames from a frame source on a background thread into a latest-wins slot.
+
+    Readers always get the newest frame; frames that arrive before anyone
+    asks for them are dropped instead of piling up in the driver buffer.
+    `source` is anything sources.create_source() accepts; None means the
+    configured default (FRAME_SOURCE, normally the first webcam).
+    """
+
+    def __init__(self, source=None):
+        self.source = source
+        self.dropped = 0
+        self._cap = None
+        self._cached = False
+        self._ended = False
+        self._thread = None
+        self._cond = threading.Condition()
+        self._latest = None
+        self._consumed = True
+        self._running = False
+        # Sequence numbers keep increasing across restarts so readers never wait on a reset counter
+        self._seq = 0
+
+    @property
+    def running(self):
+        return self._running
+
+    def configure(self, source):
+        """Switch to another frame source, restarting the reader if it is running."""
+        if source == self.source:
+            return
+        was_running = self._running
+        if was_running:
+            self.stop()
+        self.source = source
+        if was_running:
+            self.start()
+
+    def start(self):
+        """Open the frame source and start the reader thread (no-op if already running)."""
+        with self._cond:
+            if self._running:
+                return self
+            config = parse_source(DEFAULT_SOURCE if self.source is None else self.source)
+            self._cached = config.get("type", "webcam") == "webcam"
+            if self._cached:
+                WEBCAMS.start_reaper()
+                self._cap = WEBCAMS.acquire(config)
+            else:
+                self._cap = create_source(config)
+            self._ended = False
+            self._latest = None
+            self._consumed = True
+            self._running = True
+            self._thread = threading.Thread(target=self._reader, name="frame-grabber", daemon=True)
+            self._thread.start()
+        logging.info(f"Frame grabber started on {type(self._cap).__name__}")
+        return self
+
+    def stop(self, timeout=1.0):
+        """Stop the reader thread and release the frame source."""
+        with self._cond:
+            if not self._running and self._thread is None:
+                return
+            self._running = False
+            self._cond.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        if self._cap is not None:
+            if not self._cached:
+                self._cap.release()
+            elif self._ended:
+                WEBCAMS.discard(self._cap)
+            else:
+                WEBCAMS.release(self._cap)
+            self._cap = None
+        logging.info("Frame grabber stopped.")
+
+    def _reader(self):
+        while self._running:
+            ret, image = self._cap.read()
+            if not ret:
+                logging.warning("Frame source returned no frame (ended or unavailable); stopping.")
+                self._ended = True
+                break
+            with self._cond:
+                self._seq += 1
+                CAPTURED_FRAMES.inc()
+                if not self._consumed:
+                    self.dropped += 1
+                    DROPPED_CAPTURE_FRAMES.inc()
+                self._latest = Frame(image, self._seq, time.time())
+                self._consumed = False
+                self._cond.notify_all()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def latest(self):
+        """Return the newest frame without waiting (None if nothing was captured yet)."""
+        with self._cond:
+            self._consumed = True
+            return self._latest
+
+    def read(self, after_seq=0, timeout=1.0):
+        """
+        Block until a frame newer than `after_seq` is available and return it.
+        Returns None if the grabber stops or no new frame arrives within `timeout`.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._latest is None or self._latest.seq <= after_seq:
+                remaining = deadline - time.monotonic()
+                if not self._running or remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            self._consumed = True
+            return self._latest
+
+    async def next_frame(self, after_seq=0, timeout=1.0):
+        """Async variant of read() that waits off the event loop thread."""
+        return await asyncio.to_thread(self.read, after_seq, timeout)
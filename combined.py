@@ -0,0 +1,135 @@
+import cv2
+import asyncio
+import logging
+import time
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse, StreamingResponse
+from actuator import get_actuator
+from broadcast import MJPEG_MEDIA_TYPE, FrameHub
+from bus import TrackingUpdate, bus
+from capture import FrameGrabber
+from gestures import GestureRecognizer
+from inference import draw_hand_landmarks
+from metrics import PIPELINE_FRAMES
+from profiling import StageTimer
+from recording import recorded
+from tracking import DetectTracker
+
+logging.basicConfig(level=logging.INFO)
+
+app = FastAPI()
+
+# One camera feeds both models: face mesh steers the cursor with the gaze,
+# hand gestures click. Each model runs in its own inference worker.
+cam = FrameGrabber()
+FACE_MESH_OPTIONS = dict(refine_landmarks=True)
+HANDS_OPTIONS = dict(min_detection_confidence=0.8, min_tracking_confidence=0.8)
+face_tracker = DetectTracker("face", "combined-face", **FACE_MESH_OPTIONS)
+hand_tracker = DetectTracker("hands", "combined-hand", **HANDS_OPTIONS)
+trackers = (face_tracker, hand_tracker)
+recognizer = GestureRecognizer()
+actuator = get_actuator()
+screen_w, screen_h = actuator.backend.size()
+timer = StageTimer("combined")  # enabled by bench_pipeline.py
+
+GAZE_POINT = 475  # iris point the cursor follows, as in eye.py
+
+# Hand gesture -> actuator action; the gaze owns the cursor, so move_cursor is not used
+GESTURE_ACTIONS = {
+    "double_click": ("click",),
+    "swipe_right": ("hotkey", "ctrl", "right"),
+    "swipe_left": ("hotkey", "ctrl", "left"),
+    "screenshot": ("screenshot",),
+}
+
+async def process_frames():
+    """
+    Capture and flip each frame once, run face mesh and hands on it concurrently,
+    move the cursor with the gaze, click with hand gestures and publish both results.
+    """
+    cam.start()
+    seq = 0
+    while True:
+        timer.begin()
+        captured = await cam.next_frame(seq)
+        if captured is None:
+            if not cam.running:
+                break
+            continue
+        seq = captured.seq
+        timer.lap("read")
+        frame = cv2.flip(captured.image, 1)
+        # Only needed for optical-flow tracking between detections; shared by both trackers
+        gray = None
+        if any(tracker.adaptive or tracker.interval > 1 for tracker in trackers):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        timer.lap("preprocess")
+        faces, hands = await asyncio.gather(face_tracker.process(frame, gray), hand_tracker.process(frame, gray))
+        timer.lap("inference")
+        gestures = recognizer.update(hands, time.time())
+        timer.lap("gestures")
+
+        frame_height, frame_width, _ = frame.shape
+        cursor = None
+        if len(faces):
+            for x, y, _ in faces[0][474:478] * (frame_width, frame_height, 1):
+                cv2.circle(frame, (int(x), int(y)), 3, (0, 0, 255), -1)
+            cursor = (faces[0][GAZE_POINT][0] * screen_w, faces[0][GAZE_POINT][1] * screen_h)
+        for landmarks in hands:
+            draw_hand_landmarks(frame, landmarks)
+        timer.lap("draw")
+
+        bus.publish(TrackingUpdate("eye", seq, captured.timestamp, faces, []))
+        bus.publish(TrackingUpdate("hand", seq, captured.timestamp, hands, gestures))
+        timer.lap("publish")
+        if cursor is not None:
+            actuator.move_to(*cursor, pipeline="combined")
+        for name in gestures:
+            if name in GESTURE_ACTIONS:
+                action, *args = GESTURE_ACTIONS[name]
+                actuator.trigger(action, *args, pipeline="combined")
+        timer.lap("actions")
+        PIPELINE_FRAMES.labels("combined").inc()
+        yield frame
+
+# One pipeline per camera, shared by every /video_feed viewer
+hub = FrameHub(recorded("combined", process_frames, {"eye", "hand"}))
+
+@app.get("/video_feed")
+async def video_feed():
+    return StreamingResponse(hub.stream(), media_type=MJPEG_MEDIA_TYPE)
+
+@app.get("/")
+async def index():
+    html_content = """
+    <html>
+        <head>
+            <title>Gaze and Gesture Control</title>
+        </head>
+        <body style="background-color: #222; color: #fff; text-align: center;">
+            <h1>Gaze and Gesture Control</h1>
+            <img src="/video_feed" width="640" height="480" style="border: 2px solid #fff;"/>
+            <p>Look where the cursor should go; pinch index and middle finger to click.</p>
+        </body>
+    </html>
+    """
+    return HTMLResponse(content=html_content)
+
+def start_tracking(source=None):
+    """
+    Run the combined pipeline in the current event loop, publishing to the tracking bus.
+    `source` optionally selects the frame source (see sources.parse_source).
+    """
+    logging.info("Gaze and gesture tracking started.")
+    if source is not None:
+        cam.configure(source)
+    hub.start()
+
+def terminate_tracking():
+    logging.info("Gaze and gesture tracking terminated.")
+    hub.stop()
+    cam.stop()
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("combined:app", host="0.0.0.0", port=8002, reload=True)
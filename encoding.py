@@ -0,0 +1,96 @@
+import logging
+import time
+
+import cv2
+
+from metrics import ENCODE_SECONDS
+
+logging.basicConfig(level=logging.INFO)
+
+# (frame height, JPEG quality) rungs, best first
+LADDER = ((1080, 90), (720, 80), (720, 65), (480, 65), (480, 50))
+
+# Encoding may use at most this share of the frame interval before stepping down
+ENCODE_BUDGET = 0.5
+# Share of viewers dropping frames that counts as "clients are not draining"
+DROP_LIMIT = 0.2
+# Frames to wait after a change before moving on the ladder again
+SETTLE_FRAMES = 30
+# Weight of the newest sample in the moving averages
+SMOOTHING = 0.1
+
+
+class JpegEncoder:
+    """
+    JPEG encoder for one MJPEG stream that adapts resolution and quality.
+
+    It steps down the ladder when encoding takes too large a share of the
+    frame interval or viewers fail to drain their queues, and back up when
+    both have been comfortably low for a while. Rungs taller than the source
+    frame are encoded at source size; the resize buffer is reused between frames.
+    """
+
+    def __init__(self, ladder=LADDER, rung=0):
+        self.ladder = ladder
+        self.rung = rung
+        self.encode_time = 0.0
+        self.frame_interval = 0.0
+        self.drop_rate = 0.0
+        self._last_frame_at = None
+        self._settle = SETTLE_FRAMES
+        self._scaled = None
+
+    @property
+    def height(self):
+        return self.ladder[self.rung][0]
+
+    @property
+    def quality(self):
+        return self.ladder[self.rung][1]
+
+    def encode(self, frame):
+        """Encode a BGR frame at the current rung; returns a numpy byte buffer or None."""
+        now = time.perf_counter()
+        # Gaps longer than a second are pauses with no viewers, not the camera rate
+        if self._last_frame_at is not None and now - self._last_frame_at < 1.0:
+            self.frame_interval += SMOOTHING * ((now - self._last_frame_at) - self.frame_interval)
+        self._last_frame_at = now
+
+        source_height, source_width = frame.shape[:2]
+        if self.height < source_height:
+            size = (source_width * self.height // source_height, self.height)
+            if self._scaled is None or self._scaled.shape[:2] != (size[1], size[0]):
+                self._scaled = None
+            self._scaled = cv2.resize(frame, size, dst=self._scaled, interpolation=cv2.INTER_AREA)
+            frame = self._scaled
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+
+        elapsed = time.perf_counter() - now
+        ENCODE_SECONDS.observe(elapsed)
+        self.encode_time += SMOOTHING * (elapsed - self.encode_time)
+        self._adapt()
+        return buffer if ok else None
+
+    def report_drops(self, dropped, viewers):
+        """Record how many of `viewers` had to drop a frame because they were still busy."""
+        if viewers:
+            self.drop_rate += SMOOTHING * (dropped / viewers - self.drop_rate)
+
+    def _adapt(self):
+        if self._settle > 0:
+            self._settle -= 1
+            return
+        budget = self.frame_interval * ENCODE_BUDGET
+        if (self.encode_time > budget or self.drop_rate > DROP_LIMIT) and self.rung < len(self.ladder) - 1:
+            self._move(self.rung + 1)
+        elif self.encode_time < budget / 2 and self.drop_rate < DROP_LIMIT / 4 and self.rung > 0:
+            self._move(self.rung - 1)
+
+    def _move(self, rung):
+        self.rung = rung
+        self._settle = SETTLE_FRAMES
+        logging.info(
+            f"MJPEG encoder moved to {self.height}p q{self.quality} "
+            f"(encode {self.encode_time * 1000:.1f} ms, interval {self.frame_interval * 1000:.1f} ms, "
+            f"drops {self.drop_rate:.0%})"
+        )
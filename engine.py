@@ -0,0 +1,108 @@
+import logging
+import os
+import sys
+import time
+
+from profiling import StageTimer
+
+logging.basicConfig(level=logging.INFO)
+
+# Simulation steps per second; game speeds are per second, independent of the frame rate
+TICK_RATE = 30
+# Run games without pygame or a window. Defaults to headless on Linux hosts
+# without a display; GAME_HEADLESS=0/1 overrides. To measure rendering on such a
+# host, set GAME_HEADLESS=0 and SDL_VIDEODRIVER=dummy to draw off-screen.
+_NO_DISPLAY = sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+HEADLESS = os.environ.get("GAME_HEADLESS", "1" if _NO_DISPLAY else "0") == "1"
+# Steps run back to back at most after a slow frame; further lag is dropped
+MAX_CATCH_UP = 5
+
+
+class GameLoop:
+    """
+    Fixed-timestep game loop: step(dt) advances the simulation by exactly
+    1 / tick_rate seconds each tick, and render() (None when headless) draws
+    the current state once per loop iteration.
+
+    In realtime mode ticks follow the wall clock and missed steps are caught
+    up after a slow frame, so the game speed does not depend on the frame
+    rate. With realtime=False the simulation runs as fast as it can, e.g.
+    for server-side sessions or benchmarks. report() gives the per-tick time
+    budget and how often it was exceeded.
+    """
+
+    def __init__(self, name, step, render=None, is_running=lambda: True, tick_rate=TICK_RATE, profile=False):
+        self.name = name
+        self.step = step
+        self.render = render
+        self.is_running = is_running
+        self.tick_rate = tick_rate
+        self.timer = StageTimer(name, enabled=profile)
+        self.ticks = 0
+        self.over_budget = 0
+        self.dropped_ticks = 0
+        self.max_tick = 0.0
+
+    def run(self, max_ticks=None, realtime=True):
+        dt = 1.0 / self.tick_rate
+        started = time.perf_counter()
+        next_tick = started
+        while self.is_running() and (max_ticks is None or self.ticks < max_ticks):
+            if realtime:
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            tick_started = time.perf_counter()
+            self.timer.begin()
+            for _ in range(MAX_CATCH_UP if realtime else 1):
+                self.step(dt)
+                self.timer.lap("step")
+                self.ticks += 1
+                next_tick += dt
+                if not realtime or next_tick > time.perf_counter() or not self.is_running():
+                    break
+            else:
+                # Too far behind: skip the rest instead of spiralling
+                behind = int((time.perf_counter() - next_tick) / dt) + 1
+                self.dropped_ticks += behind
+                next_tick += behind * dt
+            if self.render is not None:
+                self.render()
+                self.timer.lap("render")
+            self.timer.end()
+            elapsed = time.perf_counter() - tick_started
+            self.max_tick = max(self.max_tick, elapsed)
+            if elapsed > dt:
+                self.over_budget += 1
+        wall = time.perf_counter() - started
+        logging.info(f"{self.name} loop finished: {self.report(wall)}")
+
+    def report(self, wall=None):
+        """Per-tick budget report; stage percentiles are included when profiling."""
+        report = {
+            "ticks": self.ticks,
+            "tick_rate": self.tick_rate,
+            "budget_ms": round(1000.0 / self.tick_rate, 3),
+            "max_tick_ms": round(self.max_tick * 1000.0, 3),
+            "over_budget": self.over_budget,
+            "dropped_ticks": self.dropped_ticks,
+        }
+        if wall:
+            report["ticks_per_second"] = round(self.ticks / wall, 1)
+        if self.timer.enabled:
+            report["stages"] = self.timer.summary()["stages"]
+        return report
+
+
+def init_display(title, size=(800, 600)):
+    """Initialise pygame and open the game window; returns the screen surface."""
+    import pygame
+    pygame.init()
+    screen = pygame.display.set_mode(size)
+    pygame.display.set_caption(title)
+    return screen
+
+
+def load_image(path, size):
+    import pygame
+    return pygame.transform.scale(pygame.image.load(path), size)
@@ -0,0 +1,193 @@
+import itertools
+
+import numpy as np
+
+
+class EntityStore:
+    """
+    Struct-of-arrays storage for game entities: positions, velocities and
+    box sizes in float32 arrays plus an alive mask, all of length capacity.
+
+    The first `len(store)` rows are in use. step() moves every entity in one
+    operation; kill() only clears alive flags, and compact() then removes all
+    dead rows at once with a single boolean gather per array, so removing k
+    entities costs the same as removing one. Capacity doubles when full.
+    """
+
+    def __init__(self, capacity=64):
+        self._positions = np.zeros((capacity, 2), dtype=np.float32)
+        self._velocities = np.zeros((capacity, 2), dtype=np.float32)
+        self._sizes = np.zeros((capacity, 2), dtype=np.float32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self.count = 0
+        self.dead = 0  # killed but not yet compacted
+        self.version = 0  # bumped whenever rows are added or renumbered
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def positions(self):
+        return self._positions[:self.count]
+
+    @property
+    def velocities(self):
+        return self._velocities[:self.count]
+
+    @property
+    def sizes(self):
+        return self._sizes[:self.count]
+
+    @property
+    def alive(self):
+        return self._alive[:self.count]
+
+    def spawn(self, positions, velocities=(0, 0), sizes=(0, 0)):
+        """Add one entity, or many when given (k, 2) arrays; returns their row indices."""
+        positions = np.atleast_2d(np.asarray(positions, dtype=np.float32))
+        k = len(positions)
+        start, end = self.count, self.count + k
+        if end > len(self._alive):
+            self._grow(end)
+        self._positions[start:end] = positions
+        self._velocities[start:end] = velocities
+        self._sizes[start:end] = sizes
+        self._alive[start:end] = True
+        self.count = end
+        self.version += 1
+        return np.arange(start, end)
+
+    def step(self, dt):
+        """Move every entity by its velocity over `dt` seconds."""
+        self._positions[:self.count] += self.velocities * dt
+
+    def points_inside(self, x0, y0, x1, y1):
+        """Mask of entities whose position lies strictly inside the box (x0, y0)-(x1, y1)."""
+        x, y = self.positions.T
+        inside = (x > x0) & (x < x1) & (y > y0) & (y < y1)
+        return inside & self.alive if self.dead else inside
+
+    def boxes_containing(self, x, y):
+        """Mask of entities whose box [position, position + size) contains the point (x, y)."""
+        low = self.positions
+        high = low + self.sizes
+        inside = (low[:, 0] <= x) & (x < high[:, 0]) & (low[:, 1] <= y) & (y < high[:, 1])
+        return inside & self.alive if self.dead else inside
+
+    def kill(self, mask):
+        """Mark the entities selected by `mask` (or index array) as dead; returns how many were alive."""
+        killed = int(np.count_nonzero(self.alive[mask]))
+        if killed:
+            self.alive[mask] = False
+            self.dead += killed
+        return killed
+
+    def compact(self):
+        """Drop dead entities in bulk, keeping the order of the survivors."""
+        if not self.dead:
+            return
+        keep = self.alive
+        survivors = self.count - self.dead
+        for array in (self._positions, self._velocities, self._sizes):
+            array[:survivors] = array[:self.count][keep]
+        self._alive[:survivors] = True
+        self._alive[survivors:self.count] = False
+        self.count = survivors
+        self.dead = 0
+        self.version += 1
+
+    def clear(self):
+        self._alive[:self.count] = False
+        self.count = 0
+        self.dead = 0
+        self.version += 1
+
+    def _grow(self, needed):
+        capacity = max(needed, 2 * len(self._alive))
+        for name in ("_positions", "_velocities", "_sizes", "_alive"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+
+class SpatialGrid:
+    """
+    Uniform grid over the boxes of an EntityStore, for point hit-testing.
+
+    Every entity is registered in each cell its box overlaps. update() is
+    incremental: only entities whose covered cell range changed since the
+    last call are moved between cells; the grid is rebuilt when the store
+    added or renumbered rows. query() resolves a whole batch of points
+    against the candidates of their cells in one pass.
+    """
+
+    def __init__(self, store, cell_size=200):
+        self.store = store
+        self.cell_size = cell_size
+        self.moved = 0
+        self._cells = {}
+        self._ranges = np.empty((0, 4), dtype=np.int64)
+        self._version = None
+
+    def _cell_ranges(self):
+        low = self.store.positions
+        high = low + np.maximum(self.store.sizes - 1e-3, 0)
+        return np.floor(np.hstack([low, high]) / self.cell_size).astype(np.int64)
+
+    def _add(self, row, x0, y0, x1, y1):
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self._cells.setdefault((cx, cy), set()).add(row)
+
+    def _remove(self, row, x0, y0, x1, y1):
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self._cells.get((cx, cy))
+                if cell is not None:
+                    cell.discard(row)
+                    if not cell:
+                        del self._cells[(cx, cy)]
+
+    def rebuild(self):
+        self._cells = {}
+        self._ranges = self._cell_ranges()
+        for row, cell_range in enumerate(self._ranges.tolist()):
+            self._add(row, *cell_range)
+        self._version = self.store.version
+
+    def update(self):
+        """Bring the grid up to date with the entity positions."""
+        if self._version != self.store.version:
+            self.rebuild()
+            return
+        ranges = self._cell_ranges()
+        changed = np.flatnonzero((ranges != self._ranges).any(axis=1))
+        for row in changed.tolist():
+            self._remove(row, *self._ranges[row].tolist())
+            self._add(row, *ranges[row].tolist())
+        self._ranges = ranges
+        self.moved += len(changed)
+
+    def query(self, points):
+        """
+        Hit-test (k, 2) points against the alive entities' boxes.
+        Returns (point indices, entity rows) of every hit, ordered by point.
+        The store must not have moved since the last update().
+        """
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if self._version != self.store.version:
+            self.rebuild()
+        cells = np.floor(points / self.cell_size).astype(np.int64).tolist()
+        candidates = [self._cells.get((cx, cy), ()) for cx, cy in cells]
+        counts = [len(c) for c in candidates]
+        # One (point, candidate) pair per row, then a single vectorised box test
+        rows = np.fromiter(itertools.chain.from_iterable(candidates), dtype=np.int64, count=sum(counts))
+        point_index = np.repeat(np.arange(len(points)), counts)
+        p = points[point_index]
+        low = self.store.positions[rows]
+        high = low + self.store.sizes[rows]
+        inside = ((low <= p) & (p < high)).all(axis=1)
+        if self.store.dead:
+            inside &= self.store.alive[rows]
+        return point_index[inside], rows[inside]
@@ -1,71 +1,93 @@
 import cv2
-import mediapipe as mp
-import pyautogui
-import asyncio
-import uvicorn
 import logging
-from fastapi import FastAPI, Request
+import time
+from fastapi import FastAPI
 from fastapi.responses import HTMLResponse, StreamingResponse
+from actuator import get_actuator
+from blink import EYE_POINTS, BlinkDetector
+from broadcast import MJPEG_MEDIA_TYPE, FrameHub
+from bus import TrackingUpdate, bus
+from capture import FrameGrabber
+from metrics import PIPELINE_FRAMES
+from profiling import StageTimer
+from recording import recorded
+from tracking import DetectTracker
 
 logging.basicConfig(level=logging.INFO)
 
 app = FastAPI()
 
-# Initialize video capture and mediapipe face mesh
-cam = cv2.VideoCapture(0)
-face_mesh = mp.solutions.face_mesh.FaceMesh(refine_landmarks=True)
-screen_w, screen_h = pyautogui.size()  # get the full screen size
+# Initialize video capture; mediapipe face mesh runs in the shared inference pool,
+# every DETECT_INTERVAL frames with optical-flow tracking in between
+cam = FrameGrabber()
+FACE_MESH_OPTIONS = dict(refine_landmarks=True)
+tracker = DetectTracker("face", "eye", **FACE_MESH_OPTIONS)
+actuator = get_actuator()  # cursor moves and clicks run on their own thread
+screen_w, screen_h = actuator.backend.size()  # get the full screen size
+timer = StageTimer("eye")  # enabled by bench_pipeline.py
+blink = BlinkDetector()  # eye-aspect-ratio blink-to-click over both eyes
 
-async def generate_frames():
+async def process_frames():
     """
     Capture frames from the webcam, process them using MediaPipe for facial landmarks,
-    control the mouse with eye movements, and stream the result.
+    control the mouse with eye movements, and yield the annotated frames.
     """
+    cam.start()
+    seq = 0
     while True:
-        ret, frame = cam.read()
-        if not ret:
-            break
-        frame = cv2.flip(frame, 1)
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        output = face_mesh.process(rgb_frame)
-        landmark_points = output.multi_face_landmarks
+        timer.begin()
+        captured = await cam.next_frame(seq)
+        if captured is None:
+            if not cam.running:
+                break
+            continue
+        seq = captured.seq
+        timer.lap("read")
+        frame = cv2.flip(captured.image, 1)
+        timer.lap("flip")
+        landmark_points = await tracker.process(frame)
+        timer.lap("inference")
+        gestures = []
+        cursor = None
         frame_height, frame_width, _ = frame.shape
 
-        if landmark_points:
-            landmarks = landmark_points[0].landmark
+        if len(landmark_points):
+            landmarks = landmark_points[0]
             # Process landmarks for eye tracking (indices 474 to 477)
             for idx, landmark in enumerate(landmarks[474:478]):
-                x = int(landmark.x * frame_width)
-                y = int(landmark.y * frame_height)
+                x = int(landmark[0] * frame_width)
+                y = int(landmark[1] * frame_height)
                 cv2.circle(frame, (x, y), 3, (0, 0, 255), -1)
                 if idx == 1:
-                    screen_x = (screen_w / frame_width) * x
-                    screen_y = (screen_h / frame_height) * y
-                    pyautogui.moveTo(screen_x, screen_y)
-            # Blink detection using landmarks 145 and 159 for left eye
-            left = [landmarks[145], landmarks[159]]
-            for landmark in left:
-                x = int(landmark.x * frame_width)
-                y = int(landmark.y * frame_height)
-                cv2.circle(frame, (x, y), 3, (0, 255, 255), -1)
-            if (left[0].y - left[1].y) < 0.007:
-                pyautogui.click()
-                await asyncio.sleep(1)
-        
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        yield (
-            b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" + frame_bytes + b"\r\n"
-        )
-        await asyncio.sleep(0.01)
+                    cursor = ((screen_w / frame_width) * x, (screen_h / frame_height) * y)
+            # Blink detection from the eye aspect ratio of both eyes
+            for x, y in (landmarks[EYE_POINTS.ravel(), :2] * (frame_width, frame_height)).astype(int):
+                cv2.circle(frame, (x, y), 2, (0, 255, 255), -1)
+            if blink.update(landmarks, frame.shape, time.monotonic()):
+                gestures.append("blink_click")
+        else:
+            blink.reset()
+        timer.lap("draw")
+
+        bus.publish(TrackingUpdate("eye", seq, captured.timestamp, landmark_points, gestures))
+        timer.lap("publish")
+        if cursor is not None:
+            actuator.move_to(*cursor, pipeline="eye")
+        if gestures:
+            actuator.trigger("click", pipeline="eye")
+        timer.lap("actions")
+        PIPELINE_FRAMES.labels("eye").inc()
+        yield frame
+
+# One pipeline per camera, shared by every /video_feed viewer
+hub = FrameHub(recorded("eye", process_frames, {"eye"}))
 
 @app.get("/video_feed")
 async def video_feed():
     """
     HTTP endpoint that streams the processed video feed.
     """
-    return StreamingResponse(generate_frames(), media_type="multipart/x-mixed-replace; boundary=frame")
+    return StreamingResponse(hub.stream(), media_type=MJPEG_MEDIA_TYPE)
 
 @app.get("/")
 async def index():
@@ -86,11 +108,22 @@ async def index():
     """
     return HTMLResponse(content=html_content)
 
-def start_tracking():
+def start_tracking(source=None):
+    """
+    Run the eye tracking pipeline in the current event loop, publishing to the tracking bus.
+    `source` optionally selects the frame source (see sources.parse_source).
+    """
     logging.info("Eye tracking started.")
-    uvicorn.run("eye:app", host="0.0.0.0", port=8001, reload=True)
+    if source is not None:
+        cam.configure(source)
+    hub.start()
 
 def terminate_tracking():
     logging.info("Eye tracking terminated.")
-    cam.release()
+    hub.stop()
+    cam.stop()
     cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("eye:app", host="0.0.0.0", port=8001, reload=True)
@@ -1,58 +1,125 @@
 import logging
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-import pygame
 import random
 import threading
+import numpy as np
+from engine import HEADLESS, GameLoop, init_display, load_image
+from entities import EntityStore, SpatialGrid
 
 logging.basicConfig(level=logging.INFO)
 
-# Initialize Pygame
-pygame.init()
-screen = pygame.display.set_mode((800, 600))
-pygame.display.set_caption("Eye Tracking Game")
-clock = pygame.time.Clock()
-font = pygame.font.SysFont("Arial", 36)
-
-# Load images
-background = pygame.image.load("background.png")
-background = pygame.transform.scale(background, (800, 600))
-character = pygame.image.load("character.png")
-character = pygame.transform.scale(character, (120, 120))
-balloon_img = pygame.image.load("balloon.png")
-balloon_img = pygame.transform.scale(balloon_img, (150, 170))
+# Window, font and images are only loaded when the game is drawn (see engine.HEADLESS)
+screen = None
+font = None
+background = character = balloon_img = None
 
 # Initialize game variables
-balloons = [{"x": random.randint(100, 700), "y": 600} for _ in range(5)]
+balloon_speed = 60  # Rising speed of balloons (pixels per second)
+balloon_size = (150, 170)
+balloons = EntityStore()  # top-left corner positions
+grid = SpatialGrid(balloons)  # gaze hit-testing index, kept up to date by step()
+# The game loop thread and the /detect endpoints both move and pop balloons
+state_lock = threading.Lock()
 running = True
 score = 0
+loop = None  # GameLoop of the current game, for its budget report
 
+# HTTP endpoints (/detect, /detect/batch, /ws/detect, /start, /stop) for running the
+# game standalone, e.g. `uvicorn eyegame:app`. main:app does not mount them and the
+# game process the supervisor starts per session serves no HTTP.
 app = FastAPI()
 
 class EyeLandmarks(BaseModel):
     x: int
     y: int
 
-def spawn_balloon():
-    """Spawn a balloon at a random position."""
-    balloons.append({"x": random.randint(100, 700), "y": 600})
+class GazePoint(BaseModel):
+    x: float
+    y: float
+    t: float = 0.0  # sample timestamp in seconds
+
+class GazeBatch(BaseModel):
+    points: list[GazePoint]
+
+def load_assets():
+    """Initialize Pygame, open the window and load the images."""
+    global screen, font, background, character, balloon_img
+    import pygame
+    screen = init_display("Eye Tracking Game")
+    font = pygame.font.SysFont("Arial", 36)
+    background = load_image("background.png", (800, 600))
+    character = load_image("character.png", (120, 120))
+    balloon_img = load_image("balloon.png", (150, 170))
+
+def spawn_balloon(count=1):
+    """Spawn balloons at random positions along the bottom edge."""
+    x = [random.randint(100, 700) for _ in range(count)]
+    balloons.spawn([(v, 600) for v in x], (0, -balloon_speed), balloon_size)
+
+spawn_balloon(5)
+
+def pop_balloons(points):
+    """
+    Pop every balloon hit by the (k, 2) gaze points in one grid query and
+    update the score. A balloon pops once, credited to the first point that
+    reached it; returns the number of balloons popped by each point.
+    """
+    global score
+    with state_lock:
+        point_index, rows = grid.query(points)
+        rows, first = np.unique(rows, return_index=True)
+        hits = np.bincount(point_index[first], minlength=len(points))
+        popped = balloons.kill(rows)
+        if popped:
+            balloons.compact()
+            spawn_balloon(popped)
+            score += popped
+    return hits
 
 def detect_eye_movement(eye_landmarks):
     """Detect eye movement and update game state."""
-    global score
-    x, y = eye_landmarks
-    for balloon in balloons[:]:
-        balloon_rect = pygame.Rect(balloon["x"], balloon["y"], 150, 170)
-        if balloon_rect.collidepoint(x, y):
-            balloons.remove(balloon)
-            spawn_balloon()
-            score += 1
+    pop_balloons([eye_landmarks])
+
+def detect_batch(samples):
+    """
+    Resolve a batch of (x, y, t) gaze samples in time order; returns the
+    response with the timestamps of the samples that popped a balloon.
+    """
+    samples = np.asarray(samples, dtype=np.float64).reshape(-1, 3)
+    samples = samples[np.argsort(samples[:, 2], kind="stable")]
+    hits = pop_balloons(samples[:, :2])
+    return {"score": score, "popped": int(hits.sum()), "hits": samples[hits > 0, 2].tolist()}
 
 @app.post("/detect")
 async def detect(request: EyeLandmarks):
     detect_eye_movement((request.x, request.y))
     return {"score": score}
 
+@app.post("/detect/batch")
+async def detect_batch_endpoint(request: GazeBatch):
+    """Many timestamped gaze points in one request, e.g. {"points": [{"x": 10, "y": 20, "t": 0.016}, ...]}."""
+    return detect_batch([(p.x, p.y, p.t) for p in request.points])
+
+@app.websocket("/ws/detect")
+async def detect_websocket(websocket: WebSocket):
+    """
+    Stream of gaze batches: each message is {"points": [[x, y, t], ...]} and
+    is answered with the same response as /detect/batch, or with {"error": ...}
+    for a malformed message.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                data = await websocket.receive_json()
+                response = detect_batch(data.get("points", []))
+            except (ValueError, TypeError, AttributeError) as e:
+                response = {"error": f"Malformed gaze batch: {e}"}
+            await websocket.send_json(response)
+    except WebSocketDisconnect:
+        logging.info("Gaze WebSocket disconnected")
+
 @app.get("/start")
 async def start():
     global running
@@ -65,30 +132,47 @@ async def stop():
     terminate_game()
     return {"message": "Game stopped"}
 
-def start_game():
+def step(dt):
+    """Advance the game by `dt` seconds."""
+    with state_lock:
+        balloons.step(dt)
+        # Balloons that floated off the top start again from the bottom
+        escaped = np.flatnonzero(balloons.positions[:, 1] < -70)
+        if len(escaped):
+            balloons.positions[escaped, 1] = 600
+            balloons.positions[escaped, 0] = np.random.randint(100, 701, len(escaped))
+        grid.update()
+
+def render():
+    """Draw the current state and handle window events."""
     global running
-    logging.info("Eye tracking game started.")
-    while running:
-        screen.blit(background, (0, 0))
-        for balloon in balloons:
-            screen.blit(balloon_img, (balloon["x"], balloon["y"]))
-            balloon["y"] -= 2
-            if balloon["y"] < -70:
-                balloon["y"] = 600
-                balloon["x"] = random.randint(100, 700)
+    import pygame
+    screen.blit(background, (0, 0))
+    for x, y in balloons.positions.astype(int).tolist():
+        screen.blit(balloon_img, (x, y))
+
+    score_text = font.render(f"Score: {score}", True, (255, 255, 255))
+    screen.blit(score_text, (10, 10))
 
-        score_text = font.render(f"Score: {score}", True, (255, 255, 255))
-        screen.blit(score_text, (10, 10))
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            running = False
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
+    pygame.display.update()
 
-        pygame.display.update()
-        clock.tick(30)
+def start_game(max_ticks=None, realtime=True):
+    """Run the game until terminate_game() is called."""
+    global loop
+    logging.info("Eye tracking game started.")
+    if not HEADLESS and screen is None:
+        load_assets()
+    loop = GameLoop("eyegame", step, None if HEADLESS else render, lambda: running)
+    loop.run(max_ticks, realtime)
 
 def terminate_game():
     global running
     logging.info("Eye tracking game terminated.")
     running = False
-    pygame.quit()
+    if screen is not None:
+        import pygame
+        pygame.quit()
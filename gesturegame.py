@@ -1,80 +1,102 @@
 import logging
-import pygame
 import random
+from engine import HEADLESS, GameLoop, init_display, load_image
+from entities import EntityStore
+from gestures import INDEX_TIP, as_landmark_array
 
 logging.basicConfig(level=logging.INFO)
 print("arun")
-# Initialize Pygame
-pygame.init()
-screen = pygame.display.set_mode((800, 600))
-pygame.display.set_caption("Hand Gesture Game")
-clock = pygame.time.Clock()
-font = pygame.font.SysFont("Arial", 36)
+# Window, font and images are only loaded when the game is drawn (see engine.HEADLESS)
+screen = None
+font = None
+background = character = asteroid_img = None
 
-# Load images
-background = pygame.image.load("background.png")
-background = pygame.transform.scale(background, (800, 600))
-character = pygame.image.load("character.png")
-character = pygame.transform.scale(character, (120, 120))
-asteroid_img = pygame.image.load("asteroid.png")
-asteroid_img = pygame.transform.scale(asteroid_img, (100, 100))
-
-# List to store falling asteroids
-asteroids = []
-ast_speed = 8  # Speed of falling asteroids
+# Falling asteroids (top-left corner positions)
+asteroids = EntityStore()
+ast_speed = 240  # Speed of falling asteroids (pixels per second)
+spawn_rate = 1.5  # New asteroids per second, on average
 char_x = 340  # Initial position of the character
 char_y = 480  # Fixed character position (Y-axis)
 char_speed = 20  # Speed of character movement
 running = True
+game_over = False
 score = 0
+loop = None  # GameLoop of the current game, for its budget report
+
+def load_assets():
+    """Initialize Pygame, open the window and load the images."""
+    global screen, font, background, character, asteroid_img
+    import pygame
+    screen = init_display("Hand Gesture Game")
+    font = pygame.font.SysFont("Arial", 36)
+    background = load_image("background.png", (800, 600))
+    character = load_image("character.png", (120, 120))
+    asteroid_img = load_image("asteroid.png", (100, 100))
 
 def spawn_asteroid():
     """Spawn a falling asteroid at a random X position."""
     x = random.randint(50, 750)
-    asteroids.append([x, 0])
+    asteroids.spawn((x, 0), (0, ast_speed), (100, 100))
 
 def detect_hand_movement(hand_landmarks):
-    """Detect hand movement and update character position."""
+    """
+    Detect hand movement and update character position.
+    Accepts a landmark array (see gestures.as_landmark_array) or MediaPipe landmarks.
+    """
     global char_x
-    index_tip = hand_landmarks[8]
-    x = int(index_tip.x * 800)  # Map hand position to screen width
+    index_tip = as_landmark_array(hand_landmarks)[0, INDEX_TIP]
+    x = int(index_tip[0] * 800)  # Map hand position to screen width
     if x < 400:
         char_x -= char_speed  # Move left
     else:
         char_x += char_speed  # Move right
 
-def start_game():
-    global running
-    logging.info("Hand gesture game started.")
-    spawn_asteroid()
-    while running:
-        screen.blit(background, (0, 0))
-        for asteroid in asteroids[:]:
-            asteroid[1] += ast_speed
-            screen.blit(asteroid_img, (asteroid[0], asteroid[1]))
-            if asteroid[1] > 480 and char_x < asteroid[0] < char_x + 120:
-                show_game_over()
-                running = False
-            if asteroid[1] > 600:
-                asteroids.remove(asteroid)
-                score += 1
+def step(dt):
+    """Advance the game by `dt` seconds."""
+    global running, game_over, score
+    asteroids.step(dt)
+    if asteroids.points_inside(char_x, 480, char_x + 120, float("inf")).any():
+        game_over = True
+        running = False
+    # Asteroids that left the screen score a point and are dropped in bulk
+    score += asteroids.kill(asteroids.positions[:, 1] > 600)
+    asteroids.compact()
 
-        if random.random() < 0.05:
-            spawn_asteroid()
+    if random.random() < spawn_rate * dt:
+        spawn_asteroid()
 
-        screen.blit(character, (char_x, char_y))
-        score_text = font.render(f"Score: {score}", True, (255, 0, 0))
-        screen.blit(score_text, (650, 20))
+def render():
+    """Draw the current state and handle window events."""
+    global running
+    import pygame
+    screen.blit(background, (0, 0))
+    for x, y in asteroids.positions.astype(int).tolist():
+        screen.blit(asteroid_img, (x, y))
+    screen.blit(character, (char_x, char_y))
+    score_text = font.render(f"Score: {score}", True, (255, 0, 0))
+    screen.blit(score_text, (650, 20))
+
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            running = False
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
+    pygame.display.update()
 
-        pygame.display.update()
-        clock.tick(30)
+def start_game(max_ticks=None, realtime=True):
+    """Run the game until it ends or terminate_game() is called."""
+    global loop
+    logging.info("Hand gesture game started.")
+    if not HEADLESS and screen is None:
+        load_assets()
+    spawn_asteroid()
+    loop = GameLoop("gesturegame", step, None if HEADLESS else render, lambda: running)
+    loop.run(max_ticks, realtime)
+    if game_over and not HEADLESS:
+        show_game_over()
 
 def show_game_over():
     """Display Game Over message in the center of the screen."""
+    import pygame
     font = pygame.font.SysFont("Arial", 72, bold=True)
     text = font.render("GAME OVER", True, (255, 255, 255))
     text_rect = text.get_rect(center=(400, 300))
@@ -87,4 +109,6 @@ def terminate_game():
     global running
     logging.info("Hand gesture game terminated.")
     running = False
-    pygame.quit()
+    if screen is not None:
+        import pygame
+        pygame.quit()
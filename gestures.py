@@ -0,0 +1,327 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+
+# Hand landmark indices (MediaPipe Hands)
+HAND_POINTS = 21
+WRIST = 0
+THUMB_TIP = 4
+INDEX_TIP = 8
+PALM = 9  # middle finger base; hand motion is measured on it
+MIDDLE_TIP = 12
+RING_TIP = 16
+PINKY_TIP = 20
+FINGER_TIPS = slice(INDEX_TIP, PINKY_TIP + 1, 4)  # index, middle, ring, pinky
+FINGER_BITS = np.array([1, 2, 4, 8])
+
+# Finger states in a gesture's `fingers` mask (index, middle, ring, pinky)
+UP, DOWN, ANY = 1, 0, -1
+
+# `near` is (landmark a, landmark b, max vertical distance) or None;
+# `cooldown` is the minimum number of seconds between two firings
+Gesture = namedtuple("Gesture", ["name", "fingers", "near", "cooldown"])
+
+# Checked in order; the first matching gesture wins for each hand.
+# A finger is "up" when its tip is above the wrist.
+GESTURES = (
+    Gesture("brightness_up", (UP, UP, UP, UP), None, 0.5),
+    Gesture("brightness_down", (DOWN, DOWN, DOWN, DOWN), None, 0.5),
+    Gesture("move_cursor", (UP, UP, ANY, ANY), None, 0.0),
+    Gesture("screenshot", (DOWN, UP, UP, UP), None, 0.5),
+    Gesture("double_click", (ANY, ANY, ANY, ANY), (INDEX_TIP, MIDDLE_TIP, 0.02), 0.5),
+)
+
+
+def as_landmark_array(hand_landmarks):
+    """
+    Return hand landmarks as a float32 (hands, 21, 3) array.
+    Accepts such an array, a single (21, 3) hand, or a sequence of objects with x/y/z.
+    """
+    if isinstance(hand_landmarks, np.ndarray):
+        landmarks = hand_landmarks.astype(np.float32, copy=False)
+    else:
+        landmarks = np.array([(lm.x, lm.y, lm.z) for lm in hand_landmarks], dtype=np.float32)
+    return landmarks[np.newaxis] if landmarks.ndim == 2 else landmarks
+
+
+class GestureClassifier:
+    """
+    Evaluate a gesture table against all detected hands in one vectorized pass.
+
+    The table is compiled once into a lookup from a per-hand state code
+    (which fingers are up, which distance rules hold) to the first matching
+    gesture, so classifying costs a few array operations however many
+    gestures there are, and adding one adds no branches to the hot loop.
+    Cooldowns are tracked per gesture, so one gesture never delays another:
+    a match that is cooling down falls through to the next matching row, as
+    in the original if/elif chain (so the cursor keeps moving after a
+    brightness change).
+    """
+
+    def __init__(self, gestures=GESTURES):
+        self.gestures = gestures
+        self.names = [gesture.name for gesture in gestures]
+        near = [(i, gesture.near) for i, gesture in enumerate(gestures) if gesture.near]
+        self._near_a = np.array([a for _, (a, _, _) in near], dtype=np.intp)
+        self._near_b = np.array([b for _, (_, b, _) in near], dtype=np.intp)
+        self._near_max = np.array([limit for _, (_, _, limit) in near], dtype=np.float32)
+        self._near_bits = 1 << np.arange(len(near))
+        # Hand state code: bits 0-3 say which fingers are up, the bits above which `near` rules hold.
+        # Every possible code is resolved to its matching gestures, in table order, here once.
+        codes = np.arange(16 << len(near))
+        fingers_up = (codes[:, np.newaxis] >> np.arange(4)) & 1
+        masks = np.array([gesture.fingers for gesture in gestures])
+        matches = ((fingers_up[:, np.newaxis, :] == masks) | (masks == ANY)).all(axis=2)
+        for bit, (index, _) in enumerate(near):
+            matches[:, index] &= ((codes >> (4 + bit)) & 1).astype(bool)
+        self._first_match = np.where(matches.any(axis=1), matches.argmax(axis=1), -1)
+        self._candidates = [np.flatnonzero(row).tolist() for row in matches]
+        self._cooldowns = [gesture.cooldown for gesture in gestures]
+        self._last_fired = [float("-inf")] * len(gestures)
+
+    def codes(self, landmarks):
+        """Hand state code of each hand."""
+        y = as_landmark_array(landmarks)[:, :, 1]
+        code = (y[:, FINGER_TIPS] < y[:, WRIST:WRIST + 1]).dot(FINGER_BITS)
+        if len(self._near_bits):
+            near = np.abs(y[:, self._near_a] - y[:, self._near_b]) < self._near_max
+            code += near.dot(self._near_bits) << 4
+        return code
+
+    def classify(self, landmarks):
+        """Return the index of the first matching gesture for each hand (-1 for none)."""
+        return self._first_match[self.codes(landmarks)]
+
+    def update(self, landmarks, now, steady=None):
+        """
+        Classify the hands and apply cooldowns; returns one gesture name
+        (or None) per hand: the first matching gesture that may act now.
+        Hands whose `steady` entry is False only fire gestures without a cooldown.
+        """
+        fired = []
+        for hand, code in enumerate(self.codes(landmarks).tolist()):
+            name = None
+            for index in self._candidates[code]:
+                cooldown = self._cooldowns[index]
+                if now - self._last_fired[index] < cooldown:
+                    continue
+                if cooldown and steady is not None and not steady[hand]:
+                    continue
+                self._last_fired[index] = now
+                name = self.names[index]
+                break
+            fired.append(name)
+        return fired
+
+
+# Motion gestures, measured on the palm in normalized frame coordinates
+MAX_HANDS = 2
+HISTORY = 32  # frames kept per hand, about a second at 30 fps
+MAX_JUMP = 0.25  # palm travel between two frames beyond which a hand counts as a new one
+SWIPE_WINDOW = 0.3  # seconds a swipe may take
+SWIPE_DISTANCE = 0.25  # palm travel within SWIPE_WINDOW that makes a swipe
+SWIPE_AXIS_RATIO = 2.0  # travel along the swipe axis vs across it
+HOLD_TIME = 0.8  # seconds the palm has to stay within HOLD_RADIUS
+HOLD_RADIUS = 0.02
+# Thumb-index tip distance relative to the wrist-palm length; closes below, opens above
+PINCH_CLOSE, PINCH_OPEN = 0.3, 0.45
+# Minimum seconds between two firings of each motion gesture
+MOTION_COOLDOWNS = {
+    "swipe_left": 0.6,
+    "swipe_right": 0.6,
+    "swipe_up": 0.6,
+    "swipe_down": 0.6,
+    "hold": 1.0,
+    "pinch_start": 0.0,
+    "pinch_drag": 0.0,
+    "pinch_end": 0.0,
+}
+
+
+# Points the per-frame motion features are computed from
+FEATURE_POINTS = [PALM, WRIST, THUMB_TIP, INDEX_TIP]
+
+
+class HandHistory:
+    """
+    Ring buffers of the last `capacity` landmark frames of up to `max_hands`
+    tracked hands (slots), with their timestamps. Frame k of a slot, counted
+    from when the hand appeared, is stored in row k % capacity, so adding a
+    frame is one row write however long the hand is tracked.
+    """
+
+    def __init__(self, max_hands=MAX_HANDS, capacity=HISTORY):
+        self.capacity = capacity
+        self.landmarks = np.zeros((max_hands, capacity, HAND_POINTS, 3), dtype=np.float32)
+        self.times = np.zeros((max_hands, capacity))
+        self.counts = [0] * max_hands
+
+    def push(self, slot, landmarks, now):
+        row = self.counts[slot] % self.capacity
+        self.landmarks[slot, row] = landmarks
+        self.times[slot, row] = now
+        self.counts[slot] += 1
+
+    def clear(self, slot):
+        self.counts[slot] = 0
+
+    def oldest(self, slot):
+        """Number of the oldest frame of `slot` still stored."""
+        return max(0, self.counts[slot] - self.capacity)
+
+    def recent(self, slot, frames=None):
+        """Timestamps and landmarks of the last `frames` (default all stored) frames of `slot`, oldest first."""
+        count = self.counts[slot]
+        frames = min(count, self.capacity, count if frames is None else frames)
+        rows = np.arange(count - frames, count) % self.capacity
+        return self.times[slot, rows], self.landmarks[slot, rows]
+
+
+class _TrackedHand:
+    """Incremental motion state of one hand slot."""
+
+    def __init__(self, palm, now):
+        self.palm = palm
+        self.window_start = 0  # first frame of the swipe window
+        self.anchor = palm  # where the palm came to rest
+        self.still_since = now
+        self.held = False
+        self.pinched = False
+
+
+class GestureRecognizer:
+    """
+    Pose and motion gestures of up to `max_hands` hands.
+
+    Poses come from a GestureClassifier. Each hand is matched to the slot of
+    the nearest hand of the previous frame and its landmarks are pushed to a
+    HandHistory ring buffer, over which motion gestures are recognized
+    incrementally: the swipe window start only moves forward, dropping each
+    frame once, and hold and pinch keep a few values of state, so a frame
+    costs O(1) however much history is kept.
+
+    - swipe_left / swipe_right / swipe_up / swipe_down: the palm travels
+      SWIPE_DISTANCE along one axis within SWIPE_WINDOW seconds
+    - hold: the palm stays within HOLD_RADIUS for HOLD_TIME seconds (once per rest)
+    - pinch_start / pinch_drag / pinch_end: thumb and index tips close, every
+      frame while closed, open again or the hand is lost
+
+    Swipes are not reported while pinching, and poses with a cooldown only
+    fire for hands that are neither moving fast nor pinching, so a swipe
+    with an open hand does not also change the brightness. Every gesture has
+    its own cooldown.
+    """
+
+    def __init__(self, gestures=GESTURES, max_hands=MAX_HANDS, capacity=HISTORY, cooldowns=None):
+        self.poses = GestureClassifier(gestures)
+        self.history = HandHistory(max_hands, capacity)
+        self.max_hands = max_hands
+        self.cooldowns = dict(MOTION_COOLDOWNS if cooldowns is None else cooldowns)
+        self._last_fired = dict.fromkeys(self.cooldowns, float("-inf"))
+        self._hands = [None] * max_hands
+
+    def update(self, landmarks, now):
+        """Feed one frame of hands; returns the names of the gestures that should act now."""
+        hands = as_landmark_array(landmarks)[:self.max_hands]
+        palms, pinch = [], []
+        for palm, wrist, thumb, index in hands[:, FEATURE_POINTS, :2].tolist():
+            palms.append(tuple(palm))
+            pinch.append(math.dist(thumb, index) / max(math.dist(palm, wrist), 1e-6))
+        fired = []
+        slots = self._assign(palms, now, fired)
+        motions, steady = [], []
+        for i, slot in enumerate(slots):
+            self.history.push(slot, hands[i], now)
+            names = []
+            steady.append(self._track(slot, palms[i], pinch[i], now, names))
+            motions.append(names)
+        for pose, names in zip(self.poses.update(hands, now, steady), motions):
+            if pose:
+                fired.append(pose)
+            fired.extend(names)
+        return fired
+
+    def _assign(self, palms, now, fired):
+        """
+        Slot of each hand: that of the nearest hand of the last frame within
+        MAX_JUMP, else a free one. Hands of the last frame left unmatched are dropped.
+        """
+        pairs = sorted(
+            (math.dist(palm, hand.palm), i, slot)
+            for i, palm in enumerate(palms)
+            for slot, hand in enumerate(self._hands)
+            if hand is not None
+        )
+        slots = [None] * len(palms)
+        taken = set()
+        for distance, i, slot in pairs:
+            if distance > MAX_JUMP:
+                break
+            if slots[i] is None and slot not in taken:
+                slots[i] = slot
+                taken.add(slot)
+        for slot, hand in enumerate(self._hands):
+            if hand is not None and slot not in taken:
+                # Lost: release a pinch so a drag never stays stuck
+                if hand.pinched:
+                    self._fire("pinch_end", now, fired)
+                self._hands[slot] = None
+                self.history.clear(slot)
+        free = [slot for slot in range(self.max_hands) if slot not in taken]
+        for i, slot in enumerate(slots):
+            if slot is None:
+                slots[i] = free.pop(0)
+        return slots
+
+    def _track(self, slot, palm, pinch, now, fired):
+        """Update the motion state of `slot` with its newest frame; returns whether the hand is steady."""
+        hand = self._hands[slot]
+        if hand is None:
+            hand = self._hands[slot] = _TrackedHand(palm, now)
+        hand.palm = palm
+        history = self.history
+        frame = history.counts[slot] - 1
+
+        # Swipe: palm travel since the first frame of the last SWIPE_WINDOW seconds
+        start = max(hand.window_start, history.oldest(slot))
+        while start < frame and now - history.times[slot, start % history.capacity] > SWIPE_WINDOW:
+            start += 1
+        hand.window_start = start
+        x, y = history.landmarks[slot, start % history.capacity, PALM, :2].tolist()
+        dx, dy = palm[0] - x, palm[1] - y
+        travel = math.hypot(dx, dy)
+        if travel >= SWIPE_DISTANCE and not hand.pinched:
+            name = None
+            if abs(dx) >= SWIPE_AXIS_RATIO * abs(dy):
+                name = "swipe_right" if dx > 0 else "swipe_left"
+            elif abs(dy) >= SWIPE_AXIS_RATIO * abs(dx):
+                name = "swipe_down" if dy > 0 else "swipe_up"
+            if name and self._fire(name, now, fired):
+                # The next swipe is measured from here
+                hand.window_start = frame
+
+        # Hold
+        if math.dist(palm, hand.anchor) > HOLD_RADIUS:
+            hand.anchor, hand.still_since, hand.held = palm, now, False
+        elif not hand.held and not hand.pinched and now - hand.still_since >= HOLD_TIME:
+            hand.held = self._fire("hold", now, fired)
+
+        # Pinch, with hysteresis
+        if hand.pinched:
+            if pinch > PINCH_OPEN:
+                hand.pinched = False
+                self._fire("pinch_end", now, fired)
+            else:
+                self._fire("pinch_drag", now, fired)
+        elif pinch < PINCH_CLOSE:
+            hand.pinched = True
+            self._fire("pinch_start", now, fired)
+        return travel < SWIPE_DISTANCE / 2 and not hand.pinched
+
+    def _fire(self, name, now, fired):
+        if name not in self.cooldowns or now - self._last_fired[name] < self.cooldowns[name]:
+            return False
+        self._last_fired[name] = now
+        fired.append(name)
+        return True
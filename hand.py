@@ -1,111 +1,108 @@
 import cv2
-import mediapipe as mp
-import pyautogui
-import numpy as np
 import time
-import asyncio
 from fastapi import FastAPI
 from fastapi.responses import StreamingResponse, HTMLResponse
+from actuator import get_actuator
+from broadcast import MJPEG_MEDIA_TYPE, FrameHub
+from bus import TrackingUpdate, bus
+from capture import FrameGrabber
+from gestures import INDEX_TIP, GestureRecognizer
+from inference import draw_hand_landmarks
+from metrics import PIPELINE_FRAMES
+from profiling import StageTimer
+from recording import recorded
+from tracking import DetectTracker
 
 app = FastAPI()
 
-# Initialize Mediapipe Hands and Drawing
-mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
-hands = mp_hands.Hands(min_detection_confidence=0.8, min_tracking_confidence=0.8)
+# Mediapipe Hands runs in the shared inference pool with these options,
+# every DETECT_INTERVAL frames with optical-flow tracking in between
+HANDS_OPTIONS = dict(min_detection_confidence=0.8, min_tracking_confidence=0.8)
+tracker = DetectTracker("hands", "hand", **HANDS_OPTIONS)
 
-# Initialize video capture
-cap = cv2.VideoCapture(0)
+# Initialize video capture (the camera is opened on the first stream)
+cap = FrameGrabber()
+
+# OS input runs on the actuator thread so the frame loop never waits on it
+actuator = get_actuator()
 
 # Get the screen dimensions for mapping
-screen_width, screen_height = pyautogui.size()
-prev_x, prev_y = pyautogui.position()
+screen_width, screen_height = actuator.backend.size()
+prev_x, prev_y = actuator.backend.position()
 smoothing_factor = 0.3  # Adjust to smooth cursor movement
-last_action_time = time.time()  # To debounce actions
-
-async def generate_frames():
-    global prev_x, prev_y, last_action_time
+timer = StageTimer("hand")  # enabled by bench_pipeline.py
+
+# Pose table (see gestures.GESTURES) and motion gestures, shared with hand1.py and combined.py
+recognizer = GestureRecognizer()
+
+# What each gesture does: (log message, action); "hold" is only reported on the tracking bus
+ACTIONS = {
+    "brightness_up": ("🔆 Increasing Brightness", lambda: actuator.trigger('hotkey', 'volumeup', pipeline="hand")),
+    "brightness_down": ("🔅 Decreasing Brightness", lambda: actuator.trigger('hotkey', 'volumedown', pipeline="hand")),
+    "swipe_right": ("📄 Next Page", lambda: actuator.trigger('hotkey', 'ctrl', 'right', pipeline="hand")),
+    "swipe_left": ("📄 Previous Page", lambda: actuator.trigger('hotkey', 'ctrl', 'left', pipeline="hand")),
+    "swipe_up": ("📄 Page Up", lambda: actuator.trigger('hotkey', 'pageup', pipeline="hand")),
+    "swipe_down": ("📄 Page Down", lambda: actuator.trigger('hotkey', 'pagedown', pipeline="hand")),
+    "move_cursor": ("🎯 Moving Cursor to ({x}, {y})", lambda: actuator.move_to(prev_x, prev_y, pipeline="hand")),
+    "pinch_start": ("✊ Drag Started", lambda: actuator.trigger('mouse_down', pipeline="hand", debounce=0)),
+    "pinch_drag": ("✊ Dragging to ({x}, {y})", lambda: actuator.move_to(prev_x, prev_y, pipeline="hand")),
+    "pinch_end": ("🖐️ Drag Ended", lambda: actuator.trigger('mouse_up', pipeline="hand", debounce=0)),
+    "screenshot": ("📸 Taking Screenshot", lambda: actuator.trigger('screenshot', pipeline="hand")),
+    "double_click": ("🖱️ Double Click", lambda: actuator.trigger('double_click', pipeline="hand")),
+}
+
+async def process_frames():
+    global prev_x, prev_y
+    cap.start()
+    seq = 0
     while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+        timer.begin()
+        captured = await cap.next_frame(seq)
+        if captured is None:
+            if not cap.running:
+                break
+            continue
+        seq = captured.seq
+        timer.lap("read")
         # Flip frame horizontally for mirror effect
-        frame = cv2.flip(frame, 1)
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        result = hands.process(rgb_frame)
-    
-        if result.multi_hand_landmarks:
-            for hand_landmarks in result.multi_hand_landmarks:
-                # Draw hand landmarks on frame
-                mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-                landmarks = hand_landmarks.landmark
-
-                # Get necessary landmark references
-                index_tip = landmarks[8]
-                middle_tip = landmarks[12]
-                ring_tip = landmarks[16]
-                pinky_tip = landmarks[20]
-                thumb_tip = landmarks[4]
-                palm_base = landmarks[0]
-
-                # Map index tip coordinates to screen coordinates
-                cx, cy = int(index_tip.x * screen_width), int(index_tip.y * screen_height)
-                new_x = prev_x + (cx - prev_x) * smoothing_factor
-                new_y = prev_y + (cy - prev_y) * smoothing_factor
-                prev_x, prev_y = new_x, new_y
-
-                current_time = time.time()
-                fingers = [index_tip, middle_tip, ring_tip, pinky_tip]
-
-                # Gesture 1: Increase Brightness if all finger tips are above the palm
-                if all(f.y < palm_base.y for f in fingers) and (current_time - last_action_time > 0.5):
-                    print("🔆 Increasing Brightness")
-                    pyautogui.hotkey('volumeup')
-                    last_action_time = current_time
-
-                # Gesture 2: Decrease Brightness if all finger tips are below the palm
-                elif all(f.y > palm_base.y for f in fingers) and (current_time - last_action_time > 0.5):
-                    print("🔅 Decreasing Brightness")
-                    pyautogui.hotkey('volumedown')
-                    last_action_time = current_time
-
-                # Gesture 3: Move cursor if index and middle finger are above the palm
-                elif index_tip.y < palm_base.y and middle_tip.y < palm_base.y:
-                    print(f"🎯 Moving Cursor to ({new_x}, {new_y})")
-                    pyautogui.moveTo(new_x, new_y, duration=0.05)
-
-                # Gesture 4: Swipe Page if index and middle are above while ring is below the palm
-                elif index_tip.y < palm_base.y and middle_tip.y < palm_base.y and ring_tip.y > palm_base.y and (current_time - last_action_time > 0.5):
-                    print("📄 Swiping Page")
-                    pyautogui.hotkey('ctrl', 'right')
-                    last_action_time = current_time
-
-                # Gesture 5: Take Screenshot if middle, ring, and pinky are above while index is below the palm
-                elif all(f.y < palm_base.y for f in [middle_tip, ring_tip, pinky_tip]) and index_tip.y > palm_base.y and (current_time - last_action_time > 0.5):
-                    print("📸 Taking Screenshot")
-                    pyautogui.screenshot().save(f'screenshot_{int(time.time())}.png')
-                    last_action_time = current_time
-
-                # Gesture 6: Double Click when index and middle tips are vertically close
-                elif abs(index_tip.y - middle_tip.y) < 0.02 and (current_time - last_action_time > 0.5):
-                    print("🖱️ Double Click")
-                    pyautogui.doubleClick()
-                    last_action_time = current_time
-
-        # Encode frame to JPEG
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        yield (
-            b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" + frame_bytes + b"\r\n"
-        )
-        await asyncio.sleep(0.01)
+        frame = cv2.flip(captured.image, 1)
+        timer.lap("flip")
+        hands_landmarks = await tracker.process(frame)
+        timer.lap("inference")
+        gestures = recognizer.update(hands_landmarks, time.time())
+        timer.lap("gestures")
+
+        for landmarks in hands_landmarks:
+            # Draw hand landmarks on frame
+            draw_hand_landmarks(frame, landmarks)
+
+            # Map index tip coordinates to screen coordinates
+            index_tip = landmarks[INDEX_TIP]
+            cx, cy = int(index_tip[0] * screen_width), int(index_tip[1] * screen_height)
+            prev_x = prev_x + (cx - prev_x) * smoothing_factor
+            prev_y = prev_y + (cy - prev_y) * smoothing_factor
+        timer.lap("draw")
+
+        for name in gestures:
+            if name not in ACTIONS:
+                continue
+            message, action = ACTIONS[name]
+            print(message.format(x=prev_x, y=prev_y))
+            action()
+        timer.lap("actions")
+
+        bus.publish(TrackingUpdate("hand", seq, captured.timestamp, hands_landmarks, gestures))
+        timer.lap("publish")
+        PIPELINE_FRAMES.labels("hand").inc()
+        # Hand the annotated frame to the hub, which encodes it once for all viewers
+        yield frame
+
+# One pipeline per camera, shared by every /video_feed viewer
+hub = FrameHub(recorded("hand", process_frames, {"hand"}))
 
 @app.get("/video_feed")
 async def video_feed():
-    return StreamingResponse(
-        generate_frames(), media_type="multipart/x-mixed-replace; boundary=frame"
-    )
+    return StreamingResponse(hub.stream(), media_type=MJPEG_MEDIA_TYPE)
 
 @app.get("/")
 async def index():
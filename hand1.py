@@ -1,66 +1,87 @@
 import cv2
-import mediapipe as mp
-import pyautogui
 import numpy as np
 import time
 import asyncio
 import logging
+from actuator import get_actuator
+from bus import TrackingUpdate, bus
+from capture import FrameGrabber
+from gestures import INDEX_TIP, GestureRecognizer
+from inference import draw_hand_landmarks
+from metrics import PIPELINE_FRAMES
+from recording import start_recording, stop_recording
+from tracking import DetectTracker
 
 logging.basicConfig(level=logging.INFO)
 
-# Initialize Mediapipe Hands for hand tracking
-mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
-hands = mp_hands.Hands(min_detection_confidence=0.8, min_tracking_confidence=0.8)
+# Mediapipe Hands runs in the shared inference pool with these options,
+# every DETECT_INTERVAL frames with optical-flow tracking in between
+HANDS_OPTIONS = dict(min_detection_confidence=0.8, min_tracking_confidence=0.8)
+tracker = DetectTracker("hands", "hand1", **HANDS_OPTIONS)
 
-# Capture webcam (set up once)
-cap = cv2.VideoCapture(0)
-prev_x, prev_y = pyautogui.position()
+# Capture webcam on a background thread (opened when tracking starts)
+cap = FrameGrabber()
+actuator = get_actuator()  # moves the cursor on its own thread
+prev_x, prev_y = actuator.backend.position()
 smoothing_factor = 0.3  # Smoothing factor for cursor movement
 DEBOUNCE_TIME = 0.3  # Seconds for debouncing
 last_action_time = time.time()
 running = True
+recognizer = GestureRecognizer()  # gestures are reported on the tracking bus
+recorder = None  # landmark recording of the current run when RECORD_DIR is set
 
-def _process_frame(frame):
+async def _process_frame(frame):
     frame = cv2.flip(frame, 1)
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = hands.process(rgb_frame)
-    return frame, results
+    hands_landmarks = await tracker.process(frame)
+    return frame, hands_landmarks
 
-def _handle_hand_tracking(results):
+def _handle_hand_tracking(frame, hands_landmarks):
     global prev_x, prev_y, last_action_time
-    if results.multi_hand_landmarks:
-        for hand_landmarks in results.multi_hand_landmarks:
-            mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-            landmarks = hand_landmarks.landmark
-            index_tip = landmarks[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-            # Map hand position (assumed frame width = 800) to screen X coordinate
-            cx = int(index_tip.x * 800)
-            new_x = prev_x + (cx - prev_x) * smoothing_factor
-            # Update X coordinate; Y remains unchanged for simplicity
-            prev_x, prev_y = new_x, prev_y
-            pyautogui.moveTo(new_x, prev_y, duration=0.05)
+    for landmarks in hands_landmarks:
+        draw_hand_landmarks(frame, landmarks)
+        index_tip = landmarks[INDEX_TIP]
+        # Map hand position (assumed frame width = 800) to screen X coordinate
+        cx = int(index_tip[0] * 800)
+        new_x = prev_x + (cx - prev_x) * smoothing_factor
+        # Update X coordinate; Y remains unchanged for simplicity
+        prev_x, prev_y = new_x, prev_y
+        actuator.move_to(new_x, prev_y, pipeline="hand1")
 
 async def _tracking_loop():
     global running
+    seq = 0
     while running:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        processed_frame, results = _process_frame(frame)
-        _handle_hand_tracking(results)
-        await asyncio.sleep(0.01)
+        captured = await cap.next_frame(seq)
+        if captured is None:
+            if not cap.running:
+                break
+            continue
+        seq = captured.seq
+        processed_frame, hands_landmarks = await _process_frame(captured.image)
+        _handle_hand_tracking(processed_frame, hands_landmarks)
+        if recorder is not None:
+            recorder.note_frame_shape(processed_frame.shape)
+        gestures = recognizer.update(hands_landmarks, time.time())
+        bus.publish(TrackingUpdate("hand", seq, captured.timestamp, hands_landmarks, gestures))
+        PIPELINE_FRAMES.labels("hand1").inc()
 
-def start_tracking():
+def start_tracking(source=None):
+    """Start tracking; `source` optionally selects the frame source (see sources.parse_source)."""
     logging.info("Hand tracking (hand1) started.")
-    global running
+    global running, recorder
     running = True
+    recorder = start_recording("hand1", {"hand"})
+    if source is not None:
+        cap.configure(source)
+    cap.start()
     loop = asyncio.get_event_loop()
     loop.create_task(_tracking_loop())
 
 def terminate_tracking():
-    global cap, running
+    global running, recorder
     logging.info("Hand tracking (hand1) terminated.")
     running = False
-    cap.release()
+    stop_recording(recorder)
+    recorder = None
+    cap.stop()
     cv2.destroyAllWindows()
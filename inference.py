@@ -0,0 +1,392 @@
+import asyncio
+import atexit
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from metrics import INFERENCE_ERRORS, INFERENCE_SECONDS
+from registry import ResourceCache
+
+logging.basicConfig(level=logging.INFO)
+
+# Number of landmarks per detected hand / face mesh (refined, with irises)
+HAND_LANDMARKS = 21
+FACE_LANDMARKS = 478
+
+# Largest frame a ring slot can hold (1080p BGR)
+MAX_FRAME_SHAPE = (1080, 1920, 3)
+
+# Models unused for this many seconds are closed by their worker
+MODEL_IDLE_TIMEOUT = float(os.environ.get("MODEL_IDLE_TIMEOUT", "600"))
+
+# Seconds between checks for crashed workers
+WORKER_CHECK_INTERVAL = 0.5
+
+# Hand skeleton used when drawing landmark arrays (same edges as mp.solutions.hands.HAND_CONNECTIONS)
+HAND_CONNECTIONS = (
+    (0, 1), (1, 2), (2, 3), (3, 4),
+    (0, 5), (5, 6), (6, 7), (7, 8),
+    (5, 9), (9, 10), (10, 11), (11, 12),
+    (9, 13), (13, 14), (14, 15), (15, 16),
+    (13, 17), (0, 17), (17, 18), (18, 19), (19, 20),
+)
+
+
+def hands_to_array(result):
+    """Convert a MediaPipe Hands result to a float32 (hands, 21, 3) array."""
+    if not result.multi_hand_landmarks:
+        return np.empty((0, HAND_LANDMARKS, 3), dtype=np.float32)
+    return np.array(
+        [[(lm.x, lm.y, lm.z) for lm in hand.landmark] for hand in result.multi_hand_landmarks],
+        dtype=np.float32,
+    )
+
+
+def faces_to_array(result):
+    """Convert a MediaPipe FaceMesh result to a float32 (faces, landmarks, 3) array."""
+    if not result.multi_face_landmarks:
+        return np.empty((0, FACE_LANDMARKS, 3), dtype=np.float32)
+    return np.array(
+        [[(lm.x, lm.y, lm.z) for lm in face.landmark] for face in result.multi_face_landmarks],
+        dtype=np.float32,
+    )
+
+
+def draw_hand_landmarks(frame, hand):
+    """Draw one (21, 3) hand landmark array onto a BGR frame."""
+    height, width = frame.shape[:2]
+    points = (hand[:, :2] * (width, height)).astype(np.int32)
+    for start, end in HAND_CONNECTIONS:
+        cv2.line(frame, tuple(points[start]), tuple(points[end]), (224, 224, 224), 2)
+    for x, y in points:
+        cv2.circle(frame, (int(x), int(y)), 3, (0, 0, 255), -1)
+
+
+def _create_model(kind, options):
+    import mediapipe as mp
+    if kind == "hands":
+        return mp.solutions.hands.Hands(**options), hands_to_array
+    if kind == "face":
+        return mp.solutions.face_mesh.FaceMesh(**options), faces_to_array
+    raise ValueError(f"Unknown model kind: {kind}")
+
+
+def _decode(ring, slot, shape, encoding):
+    if encoding == "jpeg":
+        bgr = cv2.imdecode(ring[slot, :shape[0]], cv2.IMREAD_COLOR)
+        if bgr is None:
+            raise ValueError("Could not decode JPEG frame")
+        return bgr
+    return ring[slot, :int(np.prod(shape))].reshape(shape)
+
+
+def _worker_main(shm_name, slots, slot_size, tasks, results):
+    """
+    Worker process: run models on frames placed in the shared-memory ring.
+    Each task message is a list of requests, answered one result at a time,
+    or ("release", key) to close the models of a stream that has ended.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray((slots, slot_size), dtype=np.uint8, buffer=shm.buf)
+    # One model per (kind, stream, options) so MediaPipe's frame-to-frame tracking stays per stream
+    models = ResourceCache(
+        "model", lambda config: _create_model(config[0], dict(config[2])),
+        lambda entry: entry[0].close(), MODEL_IDLE_TIMEOUT,
+    )
+    configs = {}  # stream key -> model configs created for it
+    evict_every = min(MODEL_IDLE_TIMEOUT, 60.0)
+    evicted_at = time.monotonic()
+    parent = os.getppid()
+    try:
+        while True:
+            if time.monotonic() - evicted_at >= evict_every:
+                models.evict_idle()
+                evicted_at = time.monotonic()
+            try:
+                task = tasks.get(timeout=1.0)
+            except queue.Empty:
+                # Exit with the pool's process even if it was killed without closing us
+                if os.getppid() != parent:
+                    break
+                continue
+            if task is None:
+                break
+            if isinstance(task, tuple):
+                for config in configs.pop(task[1], ()):
+                    models.evict(config)
+                continue
+            for ticket, slot, shape, encoding, kind, key, options in task:
+                entry = None
+                try:
+                    rgb = cv2.cvtColor(_decode(ring, slot, shape, encoding), cv2.COLOR_BGR2RGB)
+                    configs.setdefault(key, set()).add((kind, key, options))
+                    entry = models.acquire((kind, key, options))
+                    model, convert = entry
+                    results.put((ticket, slot, convert(model.process(rgb)), None))
+                except Exception as e:
+                    results.put((ticket, slot, None, f"{type(e).__name__}: {e}"))
+                finally:
+                    if entry is not None:
+                        models.release(entry)
+    finally:
+        models.clear()
+        del ring
+        shm.close()
+
+
+class InferencePool:
+    """
+    Run MediaPipe models in worker processes.
+
+    Frames are copied into a shared-memory ring of slots rather than pickled;
+    workers send back compact float32 landmark arrays. Frames of the same
+    stream key always go to the same worker so tracking state is preserved.
+    A frame can also be given as JPEG bytes, which the worker decodes, so a
+    pool sized with max_frame_shape=(max_jpeg_bytes,) has many small slots.
+    """
+
+    def __init__(self, workers=None, slots=None, max_frame_shape=MAX_FRAME_SHAPE):
+        self.workers = workers if workers is not None else max(1, (os.cpu_count() or 2) - 1)
+        self.slots = slots or self.workers * 2
+        self.slot_size = int(np.prod(max_frame_shape))
+        self._ctx = multiprocessing.get_context("spawn")
+        self._shm = None
+        self._ring = None
+        self._processes = []
+        self._task_queues = []
+        self._results = None
+        self._free_slots = queue.Queue()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._tickets = itertools.count()
+        self._affinity = {}
+        self._next_worker = itertools.cycle(range(self.workers))
+        self._collector = None
+        self._running = False
+
+    def start(self):
+        """Allocate the frame ring and launch the worker processes."""
+        if self._running:
+            return self
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_size)
+        self._ring = np.ndarray((self.slots, self.slot_size), dtype=np.uint8, buffer=self._shm.buf)
+        for slot in range(self.slots):
+            self._free_slots.put(slot)
+        self._results = self._ctx.Queue()
+        for index in range(self.workers):
+            self._task_queues.append(self._ctx.Queue())
+            self._processes.append(self._spawn(index))
+        self._running = True
+        self._collector = threading.Thread(target=self._collect, name="inference-collector", daemon=True)
+        self._collector.start()
+        logging.info(f"Inference pool started with {self.workers} workers and {self.slots} frame slots")
+        return self
+
+    def _spawn(self, index):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self._shm.name, self.slots, self.slot_size, self._task_queues[index], self._results),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def submit(self, kind, frame, key=None, timeout=1.0, **options):
+        """
+        Queue a BGR frame for inference and return a Future resolving to a landmark array.
+        Frames with the same `key` are processed in order by the same worker.
+        """
+        return self.submit_batch([(kind, frame, key, options)], timeout)[0]
+
+    def submit_batch(self, requests, timeout=1.0):
+        """
+        Queue (kind, frame, key, options) requests together and return one
+        Future per request. `frame` is a BGR array or JPEG bytes. Requests for
+        the same worker travel in one queue message. Raises queue.Empty if not
+        enough ring slots free up within `timeout`; nothing is queued then.
+        """
+        if not self._running:
+            self.start()
+        if len(requests) > self.slots:
+            raise ValueError(f"Batch of {len(requests)} frames exceeds the {self.slots} ring slots")
+        frames = []
+        for _, frame, _, _ in requests:
+            if isinstance(frame, (bytes, bytearray, memoryview)):
+                frame = np.frombuffer(frame, dtype=np.uint8)
+                frames.append((frame, frame.shape, "jpeg"))
+            else:
+                frames.append((frame, frame.shape, "raw"))
+            if frame.nbytes > self.slot_size:
+                raise ValueError(f"Frame of shape {frame.shape} does not fit in a {self.slot_size} byte slot")
+        slots = []
+        try:
+            for _ in requests:
+                slots.append(self._free_slots.get(timeout=timeout))
+        except queue.Empty:
+            for slot in slots:
+                self._free_slots.put(slot)
+            raise
+        futures = []
+        batches = {}
+        for (kind, _, key, options), (frame, shape, encoding), slot in zip(requests, frames, slots):
+            self._ring[slot, :frame.nbytes] = frame.reshape(-1)
+            future = Future()
+            ticket = next(self._tickets)
+            with self._pending_lock:
+                # Submitting threads share the affinity table
+                if key not in self._affinity:
+                    self._affinity[key] = next(self._next_worker)
+                worker = self._affinity[key]
+                self._pending[ticket] = (future, slot, worker)
+            batches.setdefault(worker, []).append(
+                (ticket, slot, shape, encoding, kind, key, tuple(sorted(options.items())))
+            )
+            futures.append(future)
+        for worker, batch in batches.items():
+            self._task_queues[worker].put(batch)
+        return futures
+
+    def release(self, key):
+        """
+        Forget stream `key` once it has ended: its worker closes the models it
+        holds for it, after any frames of it still queued.
+        """
+        with self._pending_lock:
+            worker = self._affinity.pop(key, None)
+        if worker is not None and self._running:
+            self._task_queues[worker].put(("release", key))
+
+    async def process(self, kind, frame, key=None, **options):
+        """Run inference on `frame` without blocking the event loop."""
+        started = time.perf_counter()
+        try:
+            try:
+                future = self.submit(kind, frame, key, timeout=0, **options)
+            except queue.Empty:
+                # All slots are in flight; wait for one off the event loop thread
+                future = await asyncio.to_thread(self.submit, kind, frame, key, **options)
+            landmarks = await asyncio.wrap_future(future)
+        except Exception:
+            INFERENCE_ERRORS.labels(kind).inc()
+            raise
+        INFERENCE_SECONDS.labels(kind).observe(time.perf_counter() - started)
+        return landmarks
+
+    async def process_batch(self, requests):
+        """
+        Run submit_batch() requests without blocking the event loop; returns
+        one landmark array, or the exception it failed with, per request.
+        """
+        return await asyncio.gather(*await self.queue_batch(requests))
+
+    async def queue_batch(self, requests):
+        """
+        Submit like process_batch() but return one awaitable per request, so
+        each result can be used as soon as its worker sends it.
+        """
+        started = time.perf_counter()
+        try:
+            futures = self.submit_batch(requests, timeout=0)
+        except queue.Empty:
+            futures = await asyncio.to_thread(self.submit_batch, requests)
+
+        async def wait(kind, future):
+            try:
+                landmarks = await asyncio.wrap_future(future)
+            except Exception as e:
+                INFERENCE_ERRORS.labels(kind).inc()
+                return e
+            INFERENCE_SECONDS.labels(kind).observe(time.perf_counter() - started)
+            return landmarks
+
+        return [asyncio.ensure_future(wait(request[0], future)) for request, future in zip(requests, futures)]
+
+    def _collect(self):
+        checked_at = time.monotonic()
+        while self._running:
+            # Checked on a timer too: a busy worker's results would otherwise hide a dead one
+            if time.monotonic() - checked_at >= WORKER_CHECK_INTERVAL:
+                self._check_workers()
+                checked_at = time.monotonic()
+            try:
+                ticket, slot, landmarks, error = self._results.get(timeout=WORKER_CHECK_INTERVAL)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            with self._pending_lock:
+                future, _, _ = self._pending.pop(ticket, (None, None, None))
+            if future is None:
+                # Already failed by _check_workers, which returned the slot
+                continue
+            self._free_slots.put(slot)
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(landmarks)
+
+    def _check_workers(self):
+        """Fail requests owned by crashed workers and restart them."""
+        for index, process in enumerate(self._processes):
+            if process.is_alive() or not self._running:
+                continue
+            logging.error(f"Inference worker {index} exited with code {process.exitcode}; restarting")
+            with self._pending_lock:
+                lost = [t for t, (_, _, w) in self._pending.items() if w == index]
+                for ticket in lost:
+                    future, slot, _ = self._pending.pop(ticket)
+                    self._free_slots.put(slot)
+                    future.set_exception(RuntimeError("Inference worker crashed"))
+            self._task_queues[index] = self._ctx.Queue()
+            self._processes[index] = self._spawn(index)
+
+    def close(self, timeout=2.0):
+        """Stop the workers and free the shared-memory ring."""
+        if not self._running:
+            return
+        self._running = False
+        for tasks in self._task_queues:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        if self._collector is not None:
+            self._collector.join(timeout)
+        with self._pending_lock:
+            for future, _, _ in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        self._processes.clear()
+        self._task_queues.clear()
+        self._affinity.clear()
+        self._free_slots = queue.Queue()
+        del self._ring
+        self._ring = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+        logging.info("Inference pool stopped.")
+
+
+_pool = None
+
+
+def get_pool():
+    """Return the process-wide inference pool (workers set by INFERENCE_WORKERS)."""
+    global _pool
+    if _pool is None:
+        workers = os.environ.get("INFERENCE_WORKERS")
+        _pool = InferencePool(workers=int(workers) if workers else None)
+        atexit.register(_pool.close)
+    return _pool
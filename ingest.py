@@ -0,0 +1,228 @@
+import asyncio
+import atexit
+import itertools
+import logging
+import os
+import struct
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from bus import TrackingUpdate
+from gestures import GestureRecognizer
+from inference import FACE_LANDMARKS, HAND_LANDMARKS, InferencePool
+from metrics import INGEST_BATCH_FRAMES, INGEST_FRAMES, INGEST_STREAMS
+
+logging.basicConfig(level=logging.INFO)
+
+# Binary upload message: frame id and client timestamp, followed by the JPEG bytes
+FRAME_HEADER = struct.Struct("<Id")
+
+# Upload size limit; also the size of each ring slot of the ingest pool
+MAX_JPEG_BYTES = int(os.environ.get("INGEST_MAX_JPEG_BYTES", str(512 * 1024)))
+# Frames that can be in flight at once, over all streams and models
+INGEST_SLOTS = int(os.environ.get("INGEST_SLOTS", "32"))
+
+# Model kind -> (bus source, options); same settings as hand1.py and eye.py
+MODELS = {
+    "hands": ("hand", dict(min_detection_confidence=0.8, min_tracking_confidence=0.8)),
+    "face": ("eye", dict(refine_landmarks=True)),
+}
+EMPTY = {
+    "hands": np.empty((0, HAND_LANDMARKS, 3), dtype=np.float32),
+    "face": np.empty((0, FACE_LANDMARKS, 3), dtype=np.float32),
+}
+
+UploadedFrame = namedtuple("UploadedFrame", ["frame_id", "timestamp", "jpeg", "received"])
+# Result of one frame: TrackingUpdates (seq = frame id, timestamp = client timestamp), per-model errors
+IngestResult = namedtuple("IngestResult", ["frame", "updates", "errors", "dropped"])
+
+
+class IngestStream:
+    """One uploading client: its newest undispatched frame and its results."""
+
+    def __init__(self, stream_id, models):
+        self.id = stream_id
+        self.models = models
+        self.pending = None
+        self.busy = False
+        self.closed = False
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.results = asyncio.Queue()
+        self.recognizer = GestureRecognizer() if "hands" in models else None
+
+
+class IngestHub:
+    """
+    Decode and run inference on frames uploaded by many clients on one
+    shared worker pool.
+
+    Each stream keeps only its newest frame that has not been dispatched yet
+    and has at most one frame in flight, so a client that uploads faster
+    than its frames are processed loses stale frames instead of building up
+    latency. One batcher task collects the waiting frames of all streams,
+    oldest first, and submits them together (one queue message per worker).
+    With at most one batch per worker in flight, frames wait in the streams,
+    where newer ones replace them, rather than in the worker queues, and
+    batches grow with the load. The workers decode the JPEGs, so the event
+    loop only copies bytes.
+    """
+
+    def __init__(self, pool=None, max_batch=None, max_in_flight=None):
+        self.pool = pool or InferencePool(
+            workers=int(os.environ["INGEST_WORKERS"]) if os.environ.get("INGEST_WORKERS") else None,
+            slots=INGEST_SLOTS,
+            max_frame_shape=(MAX_JPEG_BYTES,),
+        )
+        self.max_batch = max_batch or self.pool.slots
+        self.max_in_flight = max_in_flight or self.pool.workers
+        self.streams = {}
+        self.batches = 0
+        self._in_flight = 0
+        self._ids = itertools.count(1)
+        self._wakeup = None
+        self._batcher = None
+
+    def open(self, models=("hands",)):
+        """Register a client uploading frames for the given model kinds."""
+        unknown = set(models) - set(MODELS)
+        if unknown or not models:
+            raise ValueError(f"Unknown models: {sorted(unknown) or models}")
+        if len(models) > self.max_batch:
+            raise ValueError(f"At most {self.max_batch} models per stream")
+        if self._batcher is None or self._batcher.done():
+            self._wakeup = asyncio.Event()
+            self._batcher = asyncio.ensure_future(self._run())
+        stream = IngestStream(next(self._ids), tuple(models))
+        self.streams[stream.id] = stream
+        INGEST_STREAMS.inc()
+        return stream
+
+    def close(self, stream):
+        if self.streams.pop(stream.id, None) is None:
+            return
+        stream.closed = True
+        if stream.pending is not None:
+            stream.dropped += 1
+            INGEST_FRAMES.labels("dropped").inc()
+            stream.pending = None
+        self._release(stream)
+        INGEST_STREAMS.dec()
+        logging.info(f"Ingest stream {stream.id} closed: {stream.processed} frames processed, {stream.dropped} dropped")
+
+    def _release(self, stream):
+        """Let the pool close the per-stream models of a closed stream."""
+        for kind in stream.models:
+            self.pool.release(f"ingest-{stream.id}-{kind}")
+
+    def offer(self, stream, frame_id, timestamp, jpeg):
+        """Queue a frame for `stream`, replacing its previous frame if that was not dispatched yet."""
+        if len(jpeg) > MAX_JPEG_BYTES:
+            raise ValueError(f"Frame of {len(jpeg)} bytes exceeds the {MAX_JPEG_BYTES} byte limit")
+        stream.received += 1
+        if stream.pending is not None:
+            stream.dropped += 1
+            INGEST_FRAMES.labels("dropped").inc()
+        stream.pending = UploadedFrame(frame_id, timestamp, jpeg, time.perf_counter())
+        if not stream.busy:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._in_flight >= self.max_in_flight:
+                # Woken again when a batch completes
+                continue
+            ready = [s for s in self.streams.values() if s.pending is not None and not s.busy]
+            ready.sort(key=lambda s: s.pending.received)
+            batch = []
+            used = 0
+            for stream in ready:
+                if used + len(stream.models) > self.max_batch:
+                    # The rest go out with the next batch
+                    self._wakeup.set()
+                    break
+                batch.append((stream, stream.pending))
+                stream.pending = None
+                stream.busy = True
+                used += len(stream.models)
+            if batch:
+                self._in_flight += 1
+                asyncio.ensure_future(self._dispatch(batch))
+                # Let the event loop receive more frames before the next batch is cut
+                await asyncio.sleep(0)
+
+    async def _dispatch(self, batch):
+        requests = []
+        for stream, frame in batch:
+            for kind in stream.models:
+                requests.append((kind, frame.jpeg, f"ingest-{stream.id}-{kind}", MODELS[kind][1]))
+        self.batches += 1
+        INGEST_BATCH_FRAMES.observe(len(batch))
+        try:
+            waits = await self.pool.queue_batch(requests)
+            # Each stream gets its result as soon as its own frame is done
+            finishing, start = [], 0
+            for stream, frame in batch:
+                end = start + len(stream.models)
+                finishing.append(self._finish(stream, frame, waits[start:end]))
+                start = end
+            await asyncio.gather(*finishing)
+        except Exception as e:
+            logging.error(f"Ingest batch of {len(batch)} frames failed: {e}")
+            for stream, frame in batch:
+                if stream.busy:
+                    self._deliver(stream, frame, [e] * len(stream.models))
+        finally:
+            self._in_flight -= 1
+            self._wakeup.set()
+
+    async def _finish(self, stream, frame, waits):
+        self._deliver(stream, frame, await asyncio.gather(*waits))
+
+    def _deliver(self, stream, frame, results):
+        updates, errors = [], {}
+        for kind, landmarks in zip(stream.models, results):
+            if isinstance(landmarks, Exception):
+                errors[kind] = str(landmarks)
+                landmarks = EMPTY[kind]
+            gestures = []
+            if kind == "hands":
+                # Motion is timed by arrival, not by when the batch finished
+                gestures = stream.recognizer.update(landmarks, frame.received)
+            updates.append(TrackingUpdate(MODELS[kind][0], frame.frame_id, frame.timestamp, landmarks, gestures))
+        stream.busy = False
+        if stream.closed:
+            # A frame submitted after close() has taken the stream's models again
+            self._release(stream)
+            return
+        stream.processed += 1
+        INGEST_FRAMES.labels("failed" if errors else "processed").inc()
+        stream.results.put_nowait(IngestResult(frame, updates, errors, stream.dropped))
+        if stream.pending is not None:
+            self._wakeup.set()
+
+    def stats(self):
+        return {
+            "streams": len(self.streams),
+            "batches": self.batches,
+            "received": sum(s.received for s in self.streams.values()),
+            "processed": sum(s.processed for s in self.streams.values()),
+            "dropped": sum(s.dropped for s in self.streams.values()),
+        }
+
+
+_hub = None
+
+
+def get_ingest_hub():
+    """Return the process-wide ingest hub; its worker pool is stopped at exit."""
+    global _hub
+    if _hub is None:
+        _hub = IngestHub()
+        atexit.register(_hub.pool.close)
+    return _hub
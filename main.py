@@ -1,11 +1,17 @@
 import os
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import asyncio
 import json
 import logging
-import random
+import time
+from bus import PROGRAM_SOURCES, bus
+from ingest import FRAME_HEADER, get_ingest_hub
+from metrics import INGEST_SECONDS, REGISTRY, WS_CONNECTIONS, WS_MESSAGES, WS_PENDING
+from sessions import CameraBusyError, SessionLimitError, SessionRegistry
+from supervisor import PROGRAMS, get_supervisor
+from wire import BinaryEncoder
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO)
@@ -31,129 +37,335 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global variable to store the currently active program
-active_program = None
+# Each client's program runs in a session; games get a process per session
+sessions = SessionRegistry(get_supervisor())
+
+WS_PENDING.set_function(bus.pending)
+
+# Comma-separated tracking programs (or "all") to load in the background at startup,
+# so the first /start does not pay for imports and model loading
+WARMUP = os.environ.get("WARMUP", "")
+
+@app.on_event("startup")
+async def warm_up():
+    if not WARMUP:
+        return
+    programs = list(PROGRAMS) if WARMUP == "all" else [name.strip() for name in WARMUP.split(",")]
+    started = time.perf_counter()
+    await asyncio.to_thread(get_supervisor().warm, programs)
+    logging.info(f"Warm-up of {programs} handed to the tracking host in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+@app.on_event("startup")
+async def start_session_reaper():
+    sessions.start_reaper()
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def metrics():
+    """Metrics of this process and the supervised programs in the Prometheus text exposition format."""
+    remote = get_supervisor().metrics_snapshots()
+    return PlainTextResponse(REGISTRY.render(remote), media_type="text/plain; version=0.0.4")
+
 @app.post("/start")
 async def start_program(request: Request):
     """
-    Start a tracking or game program.
-    Expected JSON body: { "program": "<program_name>" }
+    Start a tracking or game program in a supervised child process.
+    Expected JSON body: { "program": "<program_name>" }, optionally with a
+    "source" for tracking programs, e.g. "synthetic", "file:session.mp4" or
+    { "type": "file", "path": "session.mp4", "pace": "fast" }. Without a
+    "session" id a new session is created; its id is returned and scopes
+    /terminate and /ws/tracking. A session runs one program at a time.
+    A tracking program whose webcam another session's tracking program is
+    reading is refused with 409.
     """
-    global active_program
     body = await request.json()
     program = body.get("program")
+    source = body.get("source")
+    session_id = body.get("session")
     if not program:
         return JSONResponse(status_code=400, content={"error": "Program not specified"})
+    if program not in PROGRAMS:
+        logging.warning(f"Unknown program: {program}")
+        return JSONResponse(status_code=400, content={"error": "Unknown program"})
 
-    active_program = program
-    logging.info(f"Starting program: {program}")
+    if session_id:
+        session = sessions.get(session_id)
+        if session is None:
+            return JSONResponse(status_code=404, content={"error": "Unknown session"})
+    else:
+        try:
+            session = sessions.create()
+        except SessionLimitError as e:
+            logging.warning(str(e))
+            return JSONResponse(status_code=429, content={"error": str(e)})
+    logging.info(f"Starting program: {program} (session {session.id})")
 
     try:
-        if program == "eye_tracking_control":
-            import eye
-            if hasattr(eye, "start_tracking"):
-                eye.start_tracking()
-        elif program == "eye_tracking_game":
-            import eyegame
-            if hasattr(eyegame, "start_game"):
-                eyegame.start_game()
-        elif program == "hand_tracking_control":
-            import hand1
-            if hasattr(hand1, "start_tracking"):
-                hand1.start_tracking()
-        elif program == "hand_tracking_game":
-            import gesturegame
-            if hasattr(gesturegame, "start_game"):
-                gesturegame.start_game()
-        else:
-            logging.warning(f"Unknown program: {program}")
-            return JSONResponse(status_code=400, content={"error": "Unknown program"})
+        status = await sessions.start(session, program, source)
+    except CameraBusyError as e:
+        logging.warning(str(e))
+        return JSONResponse(status_code=409, content={"error": str(e), "session": session.id})
     except Exception as e:
         logging.error(f"Error starting program {program}: {e}")
         return JSONResponse(status_code=500, content={"error": f"Error starting program: {str(e)}"})
 
-    return {"message": f"Program {program} started"}
+    return {"message": f"Program {program} started", "session": session.id, "status": status}
 
 @app.post("/terminate")
 async def terminate_program(request: Request):
     """
-    Terminate the currently running program.
-    Expected JSON body: { "program": "<program_name>" }
+    Terminate the program running in a session.
+    Expected JSON body: { "program": "<program_name>", "session": "<session id>" };
+    "session" may be left out while only one session runs the program.
     """
-    global active_program
     body = await request.json()
     program = body.get("program")
-    if active_program != program:
+    session_id = body.get("session")
+    if session_id:
+        session = sessions.get(session_id)
+    else:
+        running = sessions.find(program)
+        session = running[0] if len(running) == 1 else None
+    if session is None or session.program != program:
         return JSONResponse(status_code=400, content={"error": "Program mismatch or no active program"})
 
-    logging.info(f"Terminating program: {program}")
+    logging.info(f"Terminating program: {program} (session {session.id})")
     try:
-        if program == "eye_tracking_control":
-            import eye
-            if hasattr(eye, "terminate_tracking"):
-                eye.terminate_tracking()
-        elif program == "eye_tracking_game":
-            import eyegame
-            if hasattr(eyegame, "terminate_game"):
-                eyegame.terminate_game()
-        elif program == "hand_tracking_control":
-            import hand1
-            if hasattr(hand1, "terminate_tracking"):
-                hand1.terminate_tracking()
-        elif program == "hand_tracking_game":
-            import gesturegame
-            if hasattr(gesturegame, "terminate_game"):
-                gesturegame.terminate_game()
-        else:
-            logging.warning(f"Unknown program: {program}")
-            return JSONResponse(status_code=400, content={"error": "Unknown program"})
+        # Waits for a graceful shutdown (killing the process after the timeout), which frees the camera
+        await sessions.stop(session)
     except Exception as e:
         logging.error(f"Error terminating program {program}: {e}")
         return JSONResponse(status_code=500, content={"error": f"Error terminating program: {str(e)}"})
 
-    active_program = None
-    return {"message": f"Program {program} terminated"}
+    return {"message": f"Program {program} terminated", "session": session.id}
+
+@app.delete("/sessions/{session_id}")
+async def close_session(session_id: str):
+    """Stop the session's program, close its WebSockets and forget it."""
+    if not await sessions.close(session_id):
+        return JSONResponse(status_code=404, content={"error": "Unknown session"})
+    return {"message": f"Session {session_id} closed"}
+
+@app.get("/status")
+async def status():
+    """Open sessions, and state, pid, uptime, restarts and resource use of every supervised program."""
+    return {"sessions": sessions.status(), "programs": get_supervisor().status(), "ingest": get_ingest_hub().stats()}
+
+# Landmarks reported as the single x/y(/z) point of each source
+EYE_POINT = 475  # iris point eye.py steers the cursor with
+HAND_POINT = 8  # index finger tip
+IRIS_POINTS = slice(474, 478)
+
+def build_tracking_message(updates):
+    """Turn the latest bus updates into the JSON message sent to clients."""
+    message = {"timestamp": time.time()}
+    for update in updates:
+        # Sent with or without detections, so clients can measure end-to-end lag
+        message[f"{update.source}_seq"] = update.seq
+        message[f"{update.source}_timestamp"] = update.timestamp
+        if not len(update.landmarks):
+            message[update.source] = None
+            continue
+        if update.source == "eye":
+            face = update.landmarks[0]
+            x, y, _ = face[EYE_POINT].tolist()
+            message["eye"] = {
+                "x": round(x, 4),
+                "y": round(y, 4),
+                "iris": [[round(v, 4) for v in point] for point in face[IRIS_POINTS].tolist()],
+            }
+        else:
+            x, y, z = update.landmarks[0][HAND_POINT].tolist()
+            message["hand"] = {
+                "x": round(x, 4),
+                "y": round(y, 4),
+                "z": round(z, 4),
+                "gestures": list(update.gestures),
+                "landmarks": [[[round(v, 4) for v in point] for point in hand] for hand in update.landmarks.tolist()],
+            }
+    return message
+
+async def _receive_settings(websocket, settings):
+    """Apply rate changes sent by the client after the handshake."""
+    while True:
+        data = json.loads(await websocket.receive_text())
+        if "max_hz" in data:
+            settings["max_hz"] = float(data["max_hz"] or 0)
+
+async def _send_updates(websocket, subscription, settings, encoder=None):
+    """
+    Send bus updates as they arrive, at most `max_hz` times per second.
+    JSON by default; with a BinaryEncoder each update is sent as one binary message.
+    """
+    while True:
+        # Updates published while we wait or send are coalesced in the subscription
+        updates = await subscription.get()
+        sent_at = time.monotonic()
+        if encoder is None:
+            await websocket.send_text(json.dumps(build_tracking_message(updates)))
+            WS_MESSAGES.labels("json").inc()
+        else:
+            for update in updates:
+                await websocket.send_bytes(encoder.encode(update))
+            WS_MESSAGES.labels("binary").inc(len(updates))
+        if settings["max_hz"] > 0:
+            delay = 1.0 / settings["max_hz"] - (time.monotonic() - sent_at)
+            if delay > 0:
+                await asyncio.sleep(delay)
 
 @app.websocket("/ws/tracking")
 async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint to stream real-time tracking data.
-    Expects an initial JSON message with the program info.
+    Expects an initial JSON message with the program info, e.g.
+    { "program": "<program_name>", "max_hz": 30 }, or { "session": "<id>" }
+    to follow the program of a session from /start; the stream then ends
+    when the session is closed. Without max_hz updates
+    are sent at the camera rate. Adding "format": "binary" (with optional
+    "precision": "f16" | "f32" and "delta": true) switches to the compact
+    binary frames described in wire.py; JSON is the default.
     """
     await websocket.accept()
+    WS_CONNECTIONS.inc()
+    subscription = None
+    session = sender = None
     try:
         data = await websocket.receive_text()
         init_data = json.loads(data)
         program = init_data.get("program")
-        logging.info(f"WebSocket connection initiated for program: {program}")
-
-        while True:
-            tracking_data = {
-                "eye": {
-                    "x": round(random.uniform(-1, 1), 2),
-                    "y": round(random.uniform(-1, 1), 2)
-                },
-                "hand": {
-                    "x": round(random.uniform(-1, 1), 2),
-                    "y": round(random.uniform(-1, 1), 2),
-                    "z": round(random.uniform(-1, 1), 2),
-                    "gestures": []
-                }
-            }
-            if random.random() > 0.8:
-                tracking_data["hand"]["gestures"].append(random.choice(["pinch", "grab", "point"]))
-            await websocket.send_text(json.dumps(tracking_data))
-            await asyncio.sleep(1)
+        if init_data.get("session"):
+            session = sessions.get(init_data["session"])
+            if session is None:
+                await websocket.close(code=4404, reason="Unknown session")
+                return
+            program = program or session.program
+        settings = {"max_hz": float(init_data.get("max_hz") or 0)}
+        encoder = None
+        if init_data.get("format", "json") == "binary":
+            encoder = BinaryEncoder(
+                precision=init_data.get("precision", "f32"),
+                delta=bool(init_data.get("delta", False)),
+            )
+        logging.info(f"WebSocket connection initiated for program: {program} ({init_data.get('format', 'json')})")
+
+        subscription = bus.subscribe(PROGRAM_SOURCES.get(program))
+        sender = asyncio.create_task(_send_updates(websocket, subscription, settings, encoder))
+        tasks = [sender, asyncio.create_task(_receive_settings(websocket, settings))]
+        if session is not None:
+            # Closing the session cancels the sender, which ends this connection
+            session.tasks.add(sender)
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            if task.cancelled():
+                logging.info(f"Session {session.id} closed, closing its WebSocket")
+                await websocket.close()
+            else:
+                task.result()
     except WebSocketDisconnect:
         logging.info("WebSocket disconnected")
     except Exception as e:
         logging.error(f"Error in WebSocket connection: {e}")
         await websocket.close()
+    finally:
+        WS_CONNECTIONS.dec()
+        if session is not None:
+            session.tasks.discard(sender)
+            session.touch()
+        if subscription is not None:
+            bus.unsubscribe(subscription)
+            logging.info(f"WebSocket subscription closed ({subscription.coalesced} updates coalesced)")
+
+async def _receive_frames(websocket, hub, stream):
+    """Hand every uploaded frame to the ingest hub; frames that fall behind are replaced there."""
+    while True:
+        data = await websocket.receive_bytes()
+        if len(data) <= FRAME_HEADER.size:
+            raise ValueError(f"Frame message of {len(data)} bytes has no JPEG payload")
+        frame_id, timestamp = FRAME_HEADER.unpack_from(data)
+        hub.offer(stream, frame_id, timestamp, memoryview(data)[FRAME_HEADER.size:])
+
+async def _send_results(websocket, stream, encoder=None):
+    while True:
+        result = await stream.results.get()
+        if encoder is None:
+            message = build_tracking_message(result.updates)
+            message["frame"] = result.frame.frame_id
+            message["client_timestamp"] = result.frame.timestamp
+            message["server_ms"] = round((time.perf_counter() - result.frame.received) * 1000, 2)
+            message["dropped"] = result.dropped
+            if result.errors:
+                message["errors"] = result.errors
+            await websocket.send_text(json.dumps(message))
+        else:
+            for update in result.updates:
+                await websocket.send_bytes(encoder.encode(update))
+        INGEST_SECONDS.observe(time.perf_counter() - result.frame.received)
+
+@app.websocket("/ws/ingest")
+async def ingest_endpoint(websocket: WebSocket):
+    """
+    Hand and face tracking on frames streamed by the client, for hosts without a camera.
+    Expects an initial JSON message such as { "models": ["hands", "face"] }, optionally
+    with "session" and the "format" options of /ws/tracking, then one binary message per
+    frame: ingest.FRAME_HEADER (uint32 frame id, float64 client timestamp, little-endian)
+    followed by the JPEG bytes. Results come back on the same socket, as the /ws/tracking
+    JSON message plus "frame", "client_timestamp", "server_ms" and "dropped", or as binary
+    wire.py frames with seq = frame id and timestamp = client timestamp, so the client can
+    measure round-trip latency. A frame that arrives while the previous one still waits for
+    a worker replaces it.
+    """
+    await websocket.accept()
+    hub = get_ingest_hub()
+    stream = session = receiver = None
+    try:
+        init_data = json.loads(await websocket.receive_text())
+        if init_data.get("session"):
+            session = sessions.get(init_data["session"])
+            if session is None:
+                await websocket.close(code=4404, reason="Unknown session")
+                return
+        encoder = None
+        if init_data.get("format", "json") == "binary":
+            encoder = BinaryEncoder(
+                precision=init_data.get("precision", "f32"),
+                delta=bool(init_data.get("delta", False)),
+            )
+        stream = hub.open(init_data.get("models") or ["hands"])
+        logging.info(f"Ingest stream {stream.id} opened for {list(stream.models)} ({init_data.get('format', 'json')})")
+
+        receiver = asyncio.create_task(_receive_frames(websocket, hub, stream))
+        tasks = [receiver, asyncio.create_task(_send_results(websocket, stream, encoder))]
+        if session is not None:
+            # Keeps the session from being reaped; closing it ends this connection
+            session.tasks.add(receiver)
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            if task.cancelled():
+                await websocket.close()
+            else:
+                task.result()
+    except WebSocketDisconnect:
+        logging.info("Ingest WebSocket disconnected")
+    except Exception as e:
+        logging.error(f"Error in ingest WebSocket: {e}")
+        await websocket.close()
+    finally:
+        if stream is not None:
+            hub.close(stream)
+        if session is not None:
+            session.tasks.discard(receiver)
+            session.touch()
 
 # Control panel configuration endpoint
 control_panel_programs = [
@@ -161,6 +373,7 @@ control_panel_programs = [
     {"id": "eye_tracking_game", "name": "Eye Tracking Game", "description": "Play games with eye movements"},
     {"id": "hand_tracking_control", "name": "Hand Tracking Control", "description": "Control cursor with hand gestures"},
     {"id": "hand_tracking_game", "name": "Hand Tracking Game", "description": "Play games with hand gestures"},
+    {"id": "gaze_gesture_control", "name": "Gaze and Gesture Control", "description": "Steer with your eyes, click with a gesture"},
 ]
 
 @app.get("/api/control-panel")
@@ -0,0 +1,235 @@
+"""
+Minimal Prometheus-style metrics: counters, gauges and fixed-bucket
+histograms, rendered in the text exposition format by /metrics.
+
+Set METRICS_ENABLED=0 to turn every update into an early return.
+
+Programs running in supervised child processes count into their own copy of
+the registry; the supervisor collects snapshot()s of them, and render() adds
+those to this process's values.
+"""
+import bisect
+import os
+import threading
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+# Latency buckets in seconds, sized for per-frame work at 15-60 fps
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def labels(self, *values):
+        """Return the child metric for one combination of label values."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def snapshot(self):
+        """Label values -> current value of each child, as plain data."""
+        return {key: child.snapshot() for key, child in list(self._children.items())}
+
+    def render(self, remote=()):
+        """Render with the values of this metric in the `remote` registry snapshots added."""
+        values = self.snapshot()
+        for snapshot in remote:
+            for key, value in snapshot.get(self.name, {}).items():
+                values[key] = self.merge(values.get(key), value)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(values.items()):
+            lines.extend(self.render_value(key, value))
+        return lines
+
+    def merge(self, a, b):
+        return b if a is None else a + b
+
+    def render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"]
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+        self._function = None
+
+    def inc(self, amount=1.0):
+        if ENABLED:
+            with self._lock:
+                self.value += amount
+
+    def set(self, value):
+        if ENABLED:
+            self.value = value
+
+    def set_function(self, function):
+        """Compute the value with `function()` at scrape time instead."""
+        self._function = function
+
+    def snapshot(self):
+        return self._function() if self._function is not None else self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount=1.0):
+        self._default.inc(-amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+    def set_function(self, function):
+        self._default.set_function(function)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if ENABLED:
+            index = bisect.bisect_left(self.buckets, value)
+            with self._lock:
+                self.counts[index] += 1
+                self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def merge(self, a, b):
+        if a is None:
+            return b
+        return [x + y for x, y in zip(a[0], b[0])], a[1] + b[1]
+
+    def render_value(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            labels = _format_labels(self.labelnames, key, ['le="%s"' % le])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def snapshot(self):
+        """Metric name -> label values -> value, picklable, for render() in another process."""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def accumulate(self, total, snapshot):
+        """
+        Add `snapshot` to the running `total` snapshot (None to start one),
+        leaving out gauges: used to keep the counts of exited processes.
+        """
+        total = total if total is not None else {}
+        for metric in self._metrics:
+            if metric.kind == "gauge":
+                continue
+            values = total.setdefault(metric.name, {})
+            for key, value in snapshot.get(metric.name, {}).items():
+                values[key] = metric.merge(values.get(key), value)
+        return total
+
+    def render(self, remote=()):
+        """
+        Render all metrics in the Prometheus text exposition format, adding
+        the values of the `remote` snapshots (see snapshot()) to this process's.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(remote))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Pipeline metrics shared by capture.py, inference.py, encoding.py, broadcast.py,
+# ingest.py, hand.py, hand1.py, eye.py and the WebSocket handlers in main.py
+CAPTURED_FRAMES = Counter("capture_frames_total", "Frames read from the frame source")
+DROPPED_CAPTURE_FRAMES = Counter(
+    "capture_dropped_frames_total", "Captured frames replaced before any pipeline read them"
+)
+PIPELINE_FRAMES = Counter("pipeline_frames_total", "Frames fully processed by a pipeline", ["pipeline"])
+INFERENCE_SECONDS = Histogram("inference_seconds", "Time from submitting a frame to getting landmarks", ["model"])
+TRACKER_FRAMES = Counter("tracker_frames_total", "Frames resolved by running the model or by tracking", ["model", "mode"])
+INFERENCE_ERRORS = Counter("inference_errors_total", "Inference requests that failed", ["model"])
+ENCODE_SECONDS = Histogram("mjpeg_encode_seconds", "Time to resize and JPEG-encode one frame")
+MJPEG_VIEWERS = Gauge("mjpeg_viewers", "Connected /video_feed viewers")
+MJPEG_DROPPED_FRAMES = Counter("mjpeg_dropped_frames_total", "Encoded frames dropped for slow viewers")
+ACTIONS = Counter("actions_total", "OS input actions issued", ["pipeline", "action"])
+WS_CONNECTIONS = Gauge("ws_tracking_connections", "Open /ws/tracking connections")
+WS_MESSAGES = Counter("ws_tracking_messages_total", "Messages sent on /ws/tracking", ["format"])
+BUS_COALESCED = Counter("tracking_updates_coalesced_total", "Tracking updates replaced before a subscriber took them")
+WS_PENDING = Gauge("ws_tracking_pending_updates", "Tracking updates waiting to be sent, over all connections")
+INGEST_STREAMS = Gauge("ingest_streams", "Open /ws/ingest connections")
+INGEST_FRAMES = Counter("ingest_frames_total", "Uploaded frames by outcome (processed, dropped, failed)", ["outcome"])
+INGEST_BATCH_FRAMES = Histogram(
+    "ingest_batch_frames", "Uploaded frames submitted to the inference pool together", buckets=(1, 2, 4, 8, 16, 32)
+)
+INGEST_SECONDS = Histogram("ingest_seconds", "Time from receiving an uploaded frame to sending its result")
@@ -0,0 +1,54 @@
+import time
+from collections import defaultdict
+
+import numpy as np
+
+
+class StageTimer:
+    """
+    Per-stage wall-clock timer for a frame pipeline.
+
+    The pipeline calls begin() when it starts a frame and lap("<stage>") after
+    each stage; every lap records the time since the previous mark. While
+    disabled both calls return immediately, so the hooks can stay in the hot loop.
+    """
+
+    def __init__(self, name, enabled=False):
+        self.name = name
+        self.enabled = enabled
+        self.samples = defaultdict(list)
+        self._frame_start = 0.0
+        self._mark = 0.0
+
+    def begin(self):
+        if self.enabled:
+            self._frame_start = self._mark = time.perf_counter()
+
+    def lap(self, stage):
+        if self.enabled:
+            now = time.perf_counter()
+            self.samples[stage].append(now - self._mark)
+            self._mark = now
+
+    def end(self):
+        """Record the whole frame time under "total"."""
+        if self.enabled:
+            self.samples["total"].append(time.perf_counter() - self._frame_start)
+
+    def reset(self):
+        self.samples.clear()
+
+    def summary(self):
+        """Return {stage: {count, mean_ms, p50_ms, p99_ms}} plus overall fps."""
+        stages = {}
+        for stage, values in self.samples.items():
+            ms = np.array(values) * 1000.0
+            stages[stage] = {
+                "count": len(values),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            }
+        total = self.samples.get("total")
+        fps = len(total) / sum(total) if total else 0.0
+        return {"pipeline": self.name, "fps": round(fps, 2), "stages": stages}
@@ -0,0 +1,278 @@
+"""
+Landmark recordings: every TrackingUpdate of a session in a columnar on-disk
+format that reads back as NumPy memmaps.
+
+A recording is a directory with meta.json and, per source ("hand", "eye") and
+chunk of `chunk_frames` frames, one .npy file per column:
+
+    hand.00000.timestamp.npy   float64 (frames,)          capture time, NaN = unused row
+    hand.00000.seq.npy         int64   (frames,)
+    hand.00000.objects.npy     uint8   (frames,)          hands / faces detected
+    hand.00000.gestures.npy    uint32  (frames,)          bit i = meta["gestures"][i]
+    hand.00000.landmarks.npy   float32 (frames, max_objects, points, 3)
+
+Chunks are preallocated when opened and filled in place, so recording a frame
+is a few slice assignments; meta.json holds the number of rows written to each
+chunk. A chunk left by a crash is read up to its last stored timestamp.
+"""
+import heapq
+import json
+import logging
+import os
+import time
+import uuid
+
+import numpy as np
+
+from bus import TrackingUpdate, bus
+
+logging.basicConfig(level=logging.INFO)
+
+VERSION = 1
+# Frames per chunk file; a face chunk is chunk_frames * 478 * 12 bytes
+CHUNK_FRAMES = 4096
+# Objects stored per frame and source; further detections are not recorded
+MAX_OBJECTS = {"hand": 2, "eye": 1}
+MAX_GESTURES = 32
+# Record the tracking pipelines into new directories under this one when set
+RECORD_DIR = os.environ.get("RECORD_DIR")
+
+
+def _columns(points, max_objects):
+    return {
+        "timestamp": (np.float64, ()),
+        "seq": (np.int64, ()),
+        "objects": (np.uint8, ()),
+        "gestures": (np.uint32, ()),
+        "landmarks": (np.float32, (max_objects, points, 3)),
+    }
+
+
+class _SourceWriter:
+    """Preallocated memmap chunks of one source."""
+
+    def __init__(self, path, source, points, max_objects, chunk_frames):
+        self.path = path
+        self.source = source
+        self.points = points
+        self.max_objects = max_objects
+        self.chunk_frames = chunk_frames
+        self.counts = []
+        self._chunk = None
+
+    def _open_chunk(self):
+        index = len(self.counts)
+        self._chunk = {}
+        for name, (dtype, shape) in _columns(self.points, self.max_objects).items():
+            filename = os.path.join(self.path, f"{self.source}.{index:05d}.{name}.npy")
+            self._chunk[name] = np.lib.format.open_memmap(
+                filename, mode="w+", dtype=dtype, shape=(self.chunk_frames,) + shape
+            )
+        self._chunk["timestamp"][:] = np.nan
+        self.counts.append(0)
+
+    def append(self, update, gesture_bits):
+        if self._chunk is None or self.counts[-1] == self.chunk_frames:
+            self.flush()
+            self._open_chunk()
+        row = self.counts[-1]
+        landmarks = update.landmarks[:self.max_objects]
+        objects = len(landmarks)
+        self._chunk["seq"][row] = update.seq
+        self._chunk["objects"][row] = objects
+        self._chunk["gestures"][row] = gesture_bits
+        self._chunk["landmarks"][row, :objects] = landmarks
+        # Written last: a row with a timestamp is complete
+        self._chunk["timestamp"][row] = update.timestamp
+        self.counts[-1] = row + 1
+
+    def flush(self):
+        if self._chunk is not None:
+            for column in self._chunk.values():
+                column.flush()
+
+    def close(self):
+        self.flush()
+        self._chunk = None
+
+
+class LandmarkRecorder:
+    """
+    Append TrackingUpdates to a new recording directory at `path`, which
+    must not exist yet. `sources` limits which sources are stored (None for all).
+    """
+
+    def __init__(self, path, sources=None, chunk_frames=CHUNK_FRAMES, frame_shape=None, name=None):
+        os.makedirs(path)
+        self.path = path
+        self.sources = sources
+        self.chunk_frames = chunk_frames
+        self.meta = {
+            "version": VERSION,
+            "name": name or os.path.basename(path),
+            "created": time.time(),
+            "chunk_frames": chunk_frames,
+            "frame_shape": frame_shape,
+            "gestures": [],
+            "closed": False,
+            "sources": {},
+        }
+        self.frames = 0
+        self._writers = {}
+        self._write_meta()
+
+    def record(self, update):
+        """Store one update; usable as a bus tap."""
+        if self.sources is not None and update.source not in self.sources:
+            return
+        writer = self._writers.get(update.source)
+        if writer is None:
+            points = update.landmarks.shape[1]
+            writer = _SourceWriter(self.path, update.source, points, MAX_OBJECTS.get(update.source, 1), self.chunk_frames)
+            self._writers[update.source] = writer
+        chunks = len(writer.counts)
+        writer.append(update, self._gesture_bits(update.gestures))
+        self.frames += 1
+        if len(writer.counts) != chunks:
+            self._write_meta()
+
+    def note_frame_shape(self, shape):
+        """Store the camera frame size (height, width) once; blink replay depends on it."""
+        if self.meta["frame_shape"] is None:
+            self.meta["frame_shape"] = [int(shape[0]), int(shape[1])]
+            self._write_meta()
+
+    def _gesture_bits(self, gestures):
+        bits = 0
+        vocabulary = self.meta["gestures"]
+        for name in gestures:
+            if name not in vocabulary:
+                if len(vocabulary) == MAX_GESTURES:
+                    logging.warning(f"Recording {self.path} has no room for gesture {name}")
+                    continue
+                vocabulary.append(name)
+            bits |= 1 << vocabulary.index(name)
+        return bits
+
+    def _write_meta(self):
+        for source, writer in self._writers.items():
+            self.meta["sources"][source] = {
+                "points": writer.points,
+                "max_objects": writer.max_objects,
+                "chunks": list(writer.counts),
+            }
+        temporary = os.path.join(self.path, "meta.json.tmp")
+        with open(temporary, "w") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(temporary, os.path.join(self.path, "meta.json"))
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        self.meta["closed"] = True
+        self._write_meta()
+        logging.info(f"Recorded {self.frames} updates to {self.path}")
+
+
+class Recording:
+    """
+    Read-only access to a recording. Columns are memory-mapped: chunks() and
+    single-chunk column() results are views of the files, not copies.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != VERSION:
+            raise ValueError(f"Unsupported recording version: {self.meta['version']}")
+        self.gestures = self.meta["gestures"]
+
+    @property
+    def sources(self):
+        return list(self.meta["sources"])
+
+    def frames(self, source):
+        return sum(len(chunk["timestamp"]) for chunk in self.chunks(source))
+
+    def chunks(self, source):
+        """Yield each chunk of `source` as a dict of column name -> memmap view of its rows."""
+        counts = self.meta["sources"][source]["chunks"]
+        for index, count in enumerate(counts):
+            prefix = os.path.join(self.path, f"{source}.{index:05d}.")
+            chunk = {name: np.load(f"{prefix}{name}.npy", mmap_mode="r") for name in _columns(1, 1)}
+            if not self.meta["closed"] and index == len(counts) - 1:
+                # Not closed cleanly: rows up to the last stored timestamp are complete
+                stored = np.flatnonzero(~np.isnan(chunk["timestamp"]))
+                count = int(stored[-1]) + 1 if len(stored) else 0
+            yield {name: column[:count] for name, column in chunk.items()}
+
+    def column(self, source, name):
+        """Whole column of `source`; only copied when the recording has several chunks."""
+        parts = [chunk[name] for chunk in self.chunks(source)]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _updates(self, source):
+        for chunk in self.chunks(source):
+            timestamps, seqs = chunk["timestamp"].tolist(), chunk["seq"].tolist()
+            objects, bits = chunk["objects"].tolist(), chunk["gestures"].tolist()
+            landmarks = chunk["landmarks"]
+            for row, timestamp in enumerate(timestamps):
+                gestures = [name for i, name in enumerate(self.gestures) if bits[row] >> i & 1] if bits[row] else []
+                yield TrackingUpdate(source, seqs[row], timestamp, landmarks[row, :objects[row]], gestures)
+
+    def updates(self, sources=None):
+        """
+        Yield the recorded TrackingUpdates of `sources` (default all) in
+        timestamp order; landmarks are views into the memmapped chunks.
+        """
+        sources = self.sources if sources is None else [s for s in sources if s in self.meta["sources"]]
+        return heapq.merge(*(self._updates(source) for source in sources), key=lambda update: update.timestamp)
+
+
+def start_recording(name, sources):
+    """
+    With RECORD_DIR set, record the updates of `sources` published on the
+    bus in this process to a new recording; returns the recorder or None.
+    The bus carries every program's updates, so `sources` must name only
+    the sources the caller publishes itself.
+    """
+    if not RECORD_DIR:
+        return None
+    # Restarts within the same second get their own directory
+    path = os.path.join(RECORD_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+    try:
+        recorder = LandmarkRecorder(path, set(sources), name=name)
+    except OSError as e:
+        logging.error(f"Could not record {name} to {path}: {e}")
+        return None
+    bus.add_tap(recorder.record)
+    logging.info(f"Recording {name} to {path}")
+    return recorder
+
+
+def stop_recording(recorder):
+    if recorder is not None:
+        bus.remove_tap(recorder.record)
+        recorder.close()
+
+
+def recorded(name, produce, sources):
+    """
+    Wrap a FrameHub producer so each of its runs is recorded (see
+    start_recording), with the shape of the frames it yields.
+    """
+
+    async def run():
+        recorder = start_recording(name, sources)
+        frames = produce()
+        try:
+            async for frame in frames:
+                if recorder is not None:
+                    recorder.note_frame_shape(frame.shape)
+                yield frame
+        finally:
+            await frames.aclose()
+            stop_recording(recorder)
+
+    return run
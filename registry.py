@@ -0,0 +1,137 @@
+import importlib
+import json
+import logging
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+
+
+def freeze(config):
+    """Hashable cache key for a config made of dicts, lists and scalars."""
+    if isinstance(config, (dict, list, tuple)):
+        return json.dumps(config, sort_keys=True, default=str)
+    return config
+
+
+def timed_import(name):
+    """Import module `name` and log how long it took."""
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    logging.info(f"Imported {name} in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return module
+
+
+class ResourceCache:
+    """
+    Lazily created, reusable resources keyed by config, with idle eviction.
+
+    acquire(config) hands out an idle resource created for an equal config,
+    or creates one with create(config); release() returns it to the cache.
+    Resources are used by one holder at a time. A resource that stays
+    released for `idle_timeout` seconds is closed by evict_idle(), which a
+    reaper thread calls periodically once start_reaper() has been called.
+    """
+
+    def __init__(self, name, create, close=None, idle_timeout=300.0):
+        self.name = name
+        self.create = create
+        self.close = close
+        self.idle_timeout = idle_timeout
+        self.created = 0
+        self.reused = 0
+        self._entries = {}
+        self._owners = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def acquire(self, config):
+        key = freeze(config)
+        with self._lock:
+            idle = self._entries.get(key)
+            if idle:
+                resource, _ = idle.pop()
+                self._owners[id(resource)] = key
+                self.reused += 1
+                return resource
+        started = time.perf_counter()
+        resource = self.create(config)
+        logging.info(f"Created {self.name} {config} in {(time.perf_counter() - started) * 1000:.0f} ms")
+        with self._lock:
+            self._owners[id(resource)] = key
+            self.created += 1
+        return resource
+
+    def release(self, resource):
+        """Return `resource` to the cache; it is closed if idle_timeout is 0."""
+        with self._lock:
+            key = self._owners.pop(id(resource), None)
+            if key is not None and self.idle_timeout > 0:
+                self._entries.setdefault(key, []).append((resource, time.monotonic()))
+                return
+        self._close(resource)
+
+    def discard(self, resource):
+        """Close `resource` instead of returning it, e.g. after it failed."""
+        with self._lock:
+            self._owners.pop(id(resource), None)
+        self._close(resource)
+
+    def evict(self, config):
+        """Close the idle resources created for `config`."""
+        with self._lock:
+            idle = self._entries.pop(freeze(config), [])
+        for resource, _ in idle:
+            self._close(resource)
+        return len(idle)
+
+    def evict_idle(self, now=None):
+        """Close resources released more than idle_timeout seconds ago."""
+        now = time.monotonic() if now is None else now
+        expired = []
+        with self._lock:
+            for key, idle in list(self._entries.items()):
+                keep = [(resource, since) for resource, since in idle if now - since < self.idle_timeout]
+                expired.extend(resource for resource, since in idle if now - since >= self.idle_timeout)
+                if keep:
+                    self._entries[key] = keep
+                else:
+                    del self._entries[key]
+        for resource in expired:
+            logging.info(f"Evicting idle {self.name}")
+            self._close(resource)
+        return len(expired)
+
+    def clear(self):
+        """Close every idle resource."""
+        with self._lock:
+            idle = [resource for entries in self._entries.values() for resource, _ in entries]
+            self._entries = {}
+        for resource in idle:
+            self._close(resource)
+
+    def start_reaper(self, interval=1.0):
+        """Run evict_idle() every `interval` seconds on a daemon thread."""
+        if self._reaper is not None:
+            return
+
+        def reap():
+            while True:
+                time.sleep(interval)
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name=f"{self.name}-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self):
+        with self._lock:
+            idle = sum(len(entries) for entries in self._entries.values())
+        return {"in_use": len(self._owners), "idle": idle, "created": self.created, "reused": self.reused}
+
+    def _close(self, resource):
+        if self.close is None:
+            return
+        try:
+            self.close(resource)
+        except Exception as e:
+            logging.warning(f"Closing {self.name} failed: {e}")
@@ -0,0 +1,176 @@
+"""
+Replay a landmark recording (see recording.py) without a camera or any vision.
+
+The recorded updates are fed in capture-time order either into the gesture
+logic (GestureRecognizer on hands, BlinkDetector on faces) or into one of the
+games, whose fixed-timestep clock follows the recorded timestamps. Nothing
+waits on the wall clock unless --speed is given, so a replay runs as fast as
+the logic allows and, for a given --seed, gives the same result every time.
+
+    python replay.py recordings/hand-20261018-101500-4242-3f9c1a2b --target gestures
+    python replay.py recordings/hand-20261018-101500-4242-3f9c1a2b --target gesturegame --seed 1
+    python replay.py recordings/eye-20261018-102000-4243-8d04e7c1 --target eyegame --speed 1 --output replay.json
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import time
+from collections import Counter
+
+import numpy as np
+
+from recording import Recording
+
+EYE_POINT = 475  # iris point eye.py steers the cursor with
+GAME_SIZE = (800, 600)
+
+
+class Pacer:
+    """Hold a replay back to `speed` times real time (None: no waiting)."""
+
+    def __init__(self, speed=None):
+        self.speed = speed
+        self.start = None
+        self.origin = None
+
+    def wait(self, timestamp):
+        if self.start is None:
+            self.start, self.origin = time.perf_counter(), timestamp
+            return
+        if self.speed:
+            delay = (timestamp - self.origin) / self.speed - (time.perf_counter() - self.start)
+            if delay > 0:
+                time.sleep(delay)
+
+
+def replay_gestures(recording, frame_shape, pacer):
+    """
+    Classify every recorded frame again; returns the recorded and replayed
+    gesture counts and the number of frames where the two differ.
+    """
+    from blink import BlinkDetector
+    from gestures import GestureRecognizer
+
+    recognizer = GestureRecognizer()
+    blink = BlinkDetector()
+    recorded, replayed = Counter(), Counter()
+    frames = Counter()
+    changed = Counter()
+    for update in recording.updates():
+        pacer.wait(update.timestamp)
+        frames[update.source] += 1
+        gestures = []
+        if update.source == "hand":
+            gestures = recognizer.update(update.landmarks, update.timestamp)
+        elif len(update.landmarks):
+            if blink.update(update.landmarks[0], frame_shape, update.timestamp):
+                gestures.append("blink_click")
+        else:
+            blink.reset()
+        recorded.update(update.gestures)
+        replayed.update(gestures)
+        if sorted(gestures) != sorted(update.gestures):
+            changed[update.source] += 1
+    return {
+        "frames": dict(frames),
+        "recorded": dict(recorded),
+        "replayed": dict(replayed),
+        "changed_frames": dict(changed),
+    }
+
+
+def replay_game(recording, game, pacer, tick_rate):
+    """
+    Step `game` (the gesturegame or eyegame module) up to each update's
+    timestamp and feed it the update, until the recording ends or the game
+    stops running.
+    """
+    dt = 1.0 / tick_rate
+    source = "hand" if game.__name__ == "gesturegame" else "eye"
+    width, height = GAME_SIZE
+    frames = ticks = fed = 0
+    clock = origin = None
+    for update in recording.updates([source]):
+        if origin is None:
+            origin = clock = update.timestamp
+        pacer.wait(update.timestamp)
+        while clock + dt <= update.timestamp and game.running:
+            game.step(dt)
+            clock += dt
+            ticks += 1
+        if not game.running:
+            break
+        frames += 1
+        if not len(update.landmarks):
+            continue
+        if source == "hand":
+            game.detect_hand_movement(update.landmarks)
+        else:
+            x, y = update.landmarks[0, EYE_POINT, :2].tolist()
+            game.detect_eye_movement((x * width, y * height))
+        fed += 1
+    return {
+        "source": source,
+        "frames": frames,
+        "ticks": ticks,
+        "game_seconds": round(ticks * dt, 3),
+        "fed": fed,
+        "score": game.score,
+        "game_over": bool(getattr(game, "game_over", False)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="recording directory")
+    parser.add_argument("--target", choices=["gestures", "gesturegame", "eyegame"], default="gestures")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the game")
+    parser.add_argument("--frame-shape", type=int, nargs=2, default=None, metavar=("HEIGHT", "WIDTH"),
+                        help="camera frame size for blink detection (default: from the recording, else 480 640)")
+    parser.add_argument("--speed", type=float, default=None, help="replay at this multiple of real time (default: unpaced)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    recording = Recording(args.path)
+    frame_shape = args.frame_shape or recording.meta.get("frame_shape") or (480, 640)
+    pacer = Pacer(args.speed)
+    start = time.perf_counter()
+    if args.target == "gestures":
+        result = replay_gestures(recording, frame_shape, pacer)
+        frames = sum(result["frames"].values())
+        timestamps = [recording.column(source, "timestamp") for source in recording.sources]
+        timestamps = np.concatenate(timestamps) if timestamps else np.empty(0)
+        duration = float(timestamps.max() - timestamps.min()) if len(timestamps) else 0.0
+    else:
+        os.environ["GAME_HEADLESS"] = "1"
+        # The games spawn entities on import, so seed first
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+        from engine import TICK_RATE
+        game = importlib.import_module(args.target)
+        result = replay_game(recording, game, pacer, TICK_RATE)
+        # A game over ends the replay before the recording does
+        frames, duration = result["frames"], result["game_seconds"]
+    wall = time.perf_counter() - start
+
+    report = {
+        "recording": recording.meta["name"],
+        "target": args.target,
+        "frames": frames,
+        "recorded_seconds": round(duration, 3),
+        "wall_seconds": round(wall, 3),
+        "speedup": round(duration / wall, 1) if wall else None,
+        "result": result,
+    }
+    print(f"{report['recording']} -> {args.target}: {report['frames']} frames, "
+          f"{report['recorded_seconds']} s recorded, replayed in {report['wall_seconds']} s ({report['speedup']}x)")
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
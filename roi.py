@@ -0,0 +1,89 @@
+import os
+
+import cv2
+import numpy as np
+
+# Longest side of the crop sent to the model; 0 sends full frames unchanged
+ROI_SIZE = int(os.environ.get("ROI_SIZE", "256"))
+# Longest side of the full-frame image used while searching for a lost target
+SEARCH_SIZE = 640
+# Extra space around the last detection, as a share of its size on each side
+MARGIN = 0.35
+# Search the full frame every this many detections, so new hands or faces are found
+FULL_SEARCH_EVERY = 30
+
+
+class RegionOfInterest:
+    """
+    Crop the model input around the previous detection and downscale it.
+
+    crop() returns the image to run the model on and the box it covers;
+    to_frame() maps the model's landmarks back to full-frame coordinates and
+    update() re-centres the box on them. When nothing is detected the next
+    crop is a downscaled full frame, so a lost target is searched for again.
+    """
+
+    def __init__(self, size=ROI_SIZE, search_size=SEARCH_SIZE, margin=MARGIN, full_search_every=FULL_SEARCH_EVERY):
+        self.size = size
+        self.search_size = search_size
+        self.margin = margin
+        self.full_search_every = full_search_every
+        self.box = None
+        self.pixels_in = 0
+        self.pixels_sent = 0
+        self._since_full = 0
+
+    def crop(self, frame):
+        """Return (image, box) where box = (x, y, width, height) in frame pixels."""
+        height, width = frame.shape[:2]
+        if self.size <= 0:
+            return frame, (0, 0, width, height)
+        if self.box is None or self._since_full >= self.full_search_every:
+            box, limit = (0, 0, width, height), self.search_size
+            self._since_full = 0
+        else:
+            box, limit = self.box, self.size
+            self._since_full += 1
+        x, y, w, h = box
+        region = frame[y:y + h, x:x + w]
+        scale = limit / max(w, h)
+        if scale < 1:
+            region = cv2.resize(region, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+        else:
+            region = np.ascontiguousarray(region)
+        self.pixels_in += height * width
+        self.pixels_sent += region.shape[0] * region.shape[1]
+        return region, box
+
+    def to_frame(self, landmarks, box, frame_shape):
+        """Map landmarks normalized to the crop back to normalized frame coordinates."""
+        height, width = frame_shape[:2]
+        x, y, w, h = box
+        if (x, y, w, h) == (0, 0, width, height):
+            return landmarks
+        mapped = landmarks.copy()
+        mapped[..., 0] = (landmarks[..., 0] * w + x) / width
+        mapped[..., 1] = (landmarks[..., 1] * h + y) / height
+        # MediaPipe's z uses the same scale as x
+        mapped[..., 2] = landmarks[..., 2] * (w / width)
+        return mapped
+
+    def update(self, landmarks, frame_shape):
+        """Centre the next crop on `landmarks` (frame coordinates), or search again if empty."""
+        if not len(landmarks):
+            self.box = None
+            return
+        height, width = frame_shape[:2]
+        xs = landmarks[..., 0] * width
+        ys = landmarks[..., 1] * height
+        side = max(xs.max() - xs.min(), ys.max() - ys.min()) * (1 + 2 * self.margin)
+        side = int(min(max(side, 32), width, height))
+        cx, cy = (xs.max() + xs.min()) / 2, (ys.max() + ys.min()) / 2
+        x = int(np.clip(cx - side / 2, 0, width - side))
+        y = int(np.clip(cy - side / 2, 0, height - side))
+        self.box = (x, y, side, side)
+
+    @property
+    def pixel_share(self):
+        """Share of captured pixels actually sent to the model."""
+        return self.pixels_sent / self.pixels_in if self.pixels_in else 1.0
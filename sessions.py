@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+from bus import PROGRAM_SOURCES
+from sources import camera_index
+from supervisor import PROGRAMS
+
+logging.basicConfig(level=logging.INFO)
+
+# Concurrent sessions one API worker serves; /start beyond this is refused
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "32"))
+# Sessions without requests or open WebSockets for this long are closed
+SESSION_IDLE_TIMEOUT = float(os.environ.get("SESSION_IDLE_TIMEOUT", "300"))
+REAP_INTERVAL = 10.0
+
+
+class SessionLimitError(Exception):
+    pass
+
+
+class CameraBusyError(Exception):
+    pass
+
+
+class Session:
+    """
+    One client's program and the WebSocket tasks streaming its updates.
+
+    Games run as a process per session (instance "<program>:<session id>"),
+    so their state is not shared; tracking programs read the one camera and
+    are shared by every session that runs them.
+    """
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.program = None
+        self.instance = None  # supervisor name of the program
+        self.source = None
+        self.tasks = set()
+        self.created_at = time.monotonic()
+        self.last_seen = self.created_at
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def sources(self):
+        """Tracking sources the session's clients are interested in (None for all)."""
+        return PROGRAM_SOURCES.get(self.program)
+
+    def idle_for(self, now=None):
+        if self.tasks:
+            return 0.0
+        return (now or time.monotonic()) - self.last_seen
+
+    def status(self):
+        return {
+            "program": self.program,
+            "instance": self.instance,
+            "websockets": len(self.tasks),
+            "age": round(time.monotonic() - self.created_at, 1),
+            "idle": round(self.idle_for(), 1),
+        }
+
+
+class SessionRegistry:
+    """
+    Sessions keyed by id, each running at most one program through the
+    supervisor. A shared tracking program is stopped when the last session
+    using it stops it or is closed. Different tracking programs cannot read
+    the same webcam at once (CameraBusyError). Sessions idle for `idle_timeout` seconds
+    are closed by the reaper task; at most `max_sessions` exist at a time.
+    """
+
+    def __init__(self, supervisor, max_sessions=MAX_SESSIONS, idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.supervisor = supervisor
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self.reaped = 0
+        self._lock = asyncio.Lock()
+        self._reaper = None
+
+    def get(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.touch()
+        return session
+
+    def create(self):
+        if len(self.sessions) >= self.max_sessions:
+            raise SessionLimitError(f"Session limit of {self.max_sessions} reached")
+        session = Session(uuid.uuid4().hex)
+        self.sessions[session.id] = session
+        logging.info(f"Session {session.id} created ({len(self.sessions)} open)")
+        return session
+
+    def find(self, program):
+        """Sessions currently running `program`."""
+        return [session for session in self.sessions.values() if session.program == program]
+
+    def _check_camera(self, session, program, source):
+        """
+        Refuse to run a second tracking program on a webcam another one is
+        reading: each opens its own capture, and most platforms do not let
+        two open the same device. Eye plus hand tracking is gaze_gesture_control.
+        """
+        camera = camera_index(source)
+        if camera is None:
+            return
+        for other in self.sessions.values():
+            if other is session or other.program in (None, program) or PROGRAMS[other.program][1] != "tracking":
+                continue
+            if camera_index(other.source) == camera:
+                raise CameraBusyError(
+                    f"Camera {camera} is in use by {other.program}; stop it first or run gaze_gesture_control"
+                )
+
+    async def start(self, session, program, source=None):
+        """Run `program` in `session`, replacing the program it ran before."""
+        async with self._lock:
+            if PROGRAMS[program][1] == "tracking":
+                self._check_camera(session, program, source)
+            if session.program is not None:
+                await self._stop(session)
+            if PROGRAMS[program][1] == "game":
+                instance = f"{program}:{session.id}"
+                status = await asyncio.to_thread(self.supervisor.start, program, source, instance)
+            else:
+                instance = program
+                users = self.find(program)
+                if users and source == users[0].source:
+                    # Already running for another session: share it instead of restarting the camera
+                    status = self.supervisor.programs[program].status()
+                else:
+                    if users:
+                        logging.info(f"Restarting shared {program} with source {source} for session {session.id}")
+                    status = await asyncio.to_thread(self.supervisor.start, program, source)
+                    for user in users:
+                        user.source = source
+            session.program, session.instance, session.source = program, instance, source
+            session.touch()
+            return status
+
+    async def stop(self, session):
+        """Stop the session's program; returns False if it runs none."""
+        async with self._lock:
+            return await self._stop(session)
+
+    async def _stop(self, session):
+        if session.program is None:
+            return False
+        instance = session.instance
+        session.program = session.instance = session.source = None
+        session.touch()
+        if self.find(instance):
+            # Shared tracking program still used by other sessions
+            return True
+        await asyncio.to_thread(self.supervisor.stop, instance)
+        self.supervisor.forget(instance)
+        return True
+
+    async def close(self, session_id):
+        """Stop the session's program, cancel its WebSocket tasks and forget it."""
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return False
+        for task in list(session.tasks):
+            task.cancel()
+        async with self._lock:
+            await self._stop(session)
+        logging.info(f"Session {session_id} closed ({len(self.sessions)} open)")
+        return True
+
+    async def reap_idle(self):
+        now = time.monotonic()
+        idle = [session.id for session in self.sessions.values() if session.idle_for(now) > self.idle_timeout]
+        for session_id in idle:
+            logging.info(f"Session {session_id} idle for {self.idle_timeout}s, closing it")
+            await self.close(session_id)
+        self.reaped += len(idle)
+        return len(idle)
+
+    def start_reaper(self):
+        """Close idle sessions every REAP_INTERVAL seconds from the running event loop."""
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.ensure_future(self._reap_forever())
+
+    async def _reap_forever(self):
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            try:
+                await self.reap_idle()
+            except Exception as e:
+                logging.error(f"Error reaping sessions: {e}")
+
+    def status(self):
+        return {
+            "open": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "reaped": self.reaped,
+            "sessions": {session_id: session.status() for session_id, session in self.sessions.items()},
+        }
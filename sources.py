@@ -0,0 +1,164 @@
+import logging
+import os
+import time
+
+import cv2
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+
+# Source used when none is configured, e.g. "webcam:0", "file:session.mp4", "synthetic"
+DEFAULT_SOURCE = os.environ.get("FRAME_SOURCE", "webcam:0")
+
+
+class FrameSource:
+    """
+    Base class for anything the capture thread can read frames from.
+    Subclasses implement read() returning (ok, bgr_image) like cv2.VideoCapture.
+    """
+
+    fps = 30.0
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+
+class WebcamSource(FrameSource):
+    """A local camera opened with cv2.VideoCapture."""
+
+    def __init__(self, index=0):
+        self.index = index
+        self._cap = cv2.VideoCapture(index)
+        # Keep the driver queue as short as possible; we only want the newest frame
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or self.fps
+
+    def read(self):
+        return self._cap.read()
+
+    def release(self):
+        self._cap.release()
+
+
+class _Pacer:
+    """Sleep so that frame n is returned no earlier than n / fps after the first one."""
+
+    def __init__(self, fps):
+        self.interval = 1.0 / fps if fps else 0.0
+        self._start = None
+        self._count = 0
+
+    def wait(self):
+        if self._start is None:
+            self._start = time.monotonic()
+        delay = self._start + self._count * self.interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._count += 1
+
+
+class VideoFileSource(FrameSource):
+    """
+    A recorded video file. With pace="native" frames are delivered at the
+    file's frame rate like a live camera; with pace="fast" as fast as they decode.
+    """
+
+    def __init__(self, path, pace="native", loop=False):
+        if pace not in ("native", "fast"):
+            raise ValueError(f"Unknown pace: {pace}")
+        self.path = path
+        self.loop = loop
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            raise ValueError(f"Could not open video file: {path}")
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or self.fps
+        self._pacer = _Pacer(self.fps if pace == "native" else 0)
+
+    def read(self):
+        self._pacer.wait()
+        ret, frame = self._cap.read()
+        if not ret and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._cap.read()
+        return ret, frame
+
+    def release(self):
+        self._cap.release()
+
+
+class SyntheticSource(FrameSource):
+    """
+    Deterministic generated frames (a gradient with a moving disc), for
+    benchmarks and machines without a camera. Frame n is always identical.
+    """
+
+    def __init__(self, width=640, height=480, fps=30.0, frames=None, pace="native"):
+        if pace not in ("native", "fast"):
+            raise ValueError(f"Unknown pace: {pace}")
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frames = frames
+        self._index = 0
+        self._pacer = _Pacer(fps if pace == "native" else 0)
+        gradient = np.linspace(40, 200, width, dtype=np.uint8)
+        self._background = np.repeat(gradient[np.newaxis, :, np.newaxis], height, axis=0).repeat(3, axis=2)
+
+    def read(self):
+        if self.frames is not None and self._index >= self.frames:
+            return False, None
+        self._pacer.wait()
+        frame = self._background.copy()
+        phase = self._index / self.fps
+        center = (
+            int(self.width * (0.5 + 0.35 * np.cos(phase))),
+            int(self.height * (0.5 + 0.35 * np.sin(2 * phase))),
+        )
+        cv2.circle(frame, center, min(self.width, self.height) // 10, (60, 170, 230), -1)
+        self._index += 1
+        return True, frame
+
+
+def parse_source(spec):
+    """
+    Turn a source description into keyword form. Accepts a camera index,
+    a "type:argument" string (e.g. "webcam:1", "file:clip.mp4", "synthetic")
+    or a dict such as {"type": "file", "path": "clip.mp4", "pace": "fast"}.
+    """
+    if isinstance(spec, dict):
+        return dict(spec)
+    if isinstance(spec, int):
+        return {"type": "webcam", "index": spec}
+    kind, _, argument = str(spec).partition(":")
+    if kind == "webcam":
+        return {"type": "webcam", "index": int(argument or 0)}
+    if kind == "file":
+        return {"type": "file", "path": argument}
+    if kind == "synthetic":
+        return {"type": "synthetic"}
+    raise ValueError(f"Unknown frame source: {spec!r}")
+
+
+def camera_index(spec=None):
+    """Webcam index the source `spec` (None for FRAME_SOURCE) reads from, or None if it is not a webcam."""
+    config = parse_source(DEFAULT_SOURCE if spec is None else spec)
+    if config.get("type", "webcam") != "webcam":
+        return None
+    return int(config.get("index", 0))
+
+
+def create_source(spec=None):
+    """Open the frame source described by `spec` (see parse_source); defaults to FRAME_SOURCE."""
+    config = parse_source(DEFAULT_SOURCE if spec is None else spec)
+    kind = config.pop("type", "webcam")
+    logging.info(f"Opening {kind} frame source {config}")
+    if kind == "webcam":
+        return WebcamSource(**config)
+    if kind == "file":
+        return VideoFileSource(**config)
+    if kind == "synthetic":
+        return SyntheticSource(**config)
+    raise ValueError(f"Unknown frame source type: {kind}")
@@ -0,0 +1,459 @@
+import asyncio
+import atexit
+import importlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from bus import TrackingUpdate, bus
+from metrics import REGISTRY
+
+logging.basicConfig(level=logging.INFO)
+
+# Program name -> (module, kind). Tracking modules provide start_tracking(source)
+# and terminate_tracking() and all run in one shared tracking host process;
+# games provide start_game() and terminate_game() and get a process each.
+PROGRAMS = {
+    "eye_tracking_control": ("eye", "tracking"),
+    "eye_tracking_game": ("eyegame", "game"),
+    "hand_tracking_control": ("hand1", "tracking"),
+    "hand_tracking_game": ("gesturegame", "game"),
+    "gaze_gesture_control": ("combined", "tracking"),
+}
+HOST = "tracking_host"
+
+STOP_TIMEOUT = 5.0  # seconds a program gets to shut down before it is killed
+BACKOFF_START = 1.0  # first restart delay after a crash, doubled per crash
+BACKOFF_MAX = 30.0
+STABLE_AFTER = 30.0  # a run this long resets the restart delay
+UPDATE_QUEUE_SIZE = 64  # tracking updates buffered between a program and this process
+# The tracking host (with its imports and models) is kept this long after its last program stops
+HOST_IDLE_TIMEOUT = float(os.environ.get("HOST_IDLE_TIMEOUT", "600"))
+METRICS_INTERVAL = 1.0  # seconds between metric snapshots sent by each child process
+
+
+def _watch_stop(stop, parent):
+    """Block until the supervisor asks us to stop or the supervisor process is gone."""
+    while not stop.wait(0.5):
+        if os.getppid() != parent:
+            return
+
+
+def _send_metrics(updates):
+    try:
+        updates.put_nowait(("metrics", os.getpid(), REGISTRY.snapshot()))
+    except queue.Full:
+        # The next snapshot carries the same counts
+        pass
+
+
+def _report_metrics(updates, stop):
+    """Send this process's metric values to the supervisor every METRICS_INTERVAL seconds."""
+    while not stop.wait(METRICS_INTERVAL):
+        _send_metrics(updates)
+
+
+def _start_metrics_reporter(updates, stop):
+    threading.Thread(target=_report_metrics, args=(updates, stop), name="metrics-reporter", daemon=True).start()
+
+
+async def _forward_updates(updates):
+    # Forward everything the programs publish to the supervisor's bus
+    subscription = bus.subscribe()
+    try:
+        while True:
+            for update in await subscription.get():
+                try:
+                    updates.put_nowait(update)
+                except queue.Full:
+                    pass
+    finally:
+        bus.unsubscribe(subscription)
+
+
+async def _host_loop(commands, updates, stop, parent):
+    from registry import timed_import
+
+    forwarder = asyncio.ensure_future(_forward_updates(updates))
+    modules = {}
+    running = {}
+    try:
+        while not stop.is_set() and os.getppid() == parent:
+            try:
+                command, name, source = await asyncio.to_thread(commands.get, True, 0.5)
+            except queue.Empty:
+                continue
+            if name in running and command != "warm":
+                running.pop(name).terminate_tracking()
+            if command == "stop":
+                updates.put(("stopped", name, None), timeout=1.0)
+                continue
+            started = time.perf_counter()
+            if name not in modules:
+                modules[name] = timed_import(PROGRAMS[name][0])
+            module = modules[name]
+            if command == "warm":
+                for tracker in getattr(module, "trackers", None) or (module.tracker,):
+                    await tracker.warm_up()
+                continue
+            module.start_tracking(source=source)
+            running[name] = module
+            logging.info(f"Started {name} in {(time.perf_counter() - started) * 1000:.0f} ms")
+    finally:
+        for module in running.values():
+            module.terminate_tracking()
+        forwarder.cancel()
+        _send_metrics(updates)
+
+
+def _host_main(commands, updates, stop, parent):
+    """Entry point of the tracking host: runs tracking programs on commands from the supervisor."""
+    logging.basicConfig(level=logging.INFO)
+    _start_metrics_reporter(updates, stop)
+    asyncio.run(_host_loop(commands, updates, stop, parent))
+
+
+def _program_main(program, source, updates, stop, parent):
+    """Entry point of a game's child process."""
+    logging.basicConfig(level=logging.INFO)
+    module = importlib.import_module(PROGRAMS[program][0])
+
+    def end_game():
+        _watch_stop(stop, parent)
+        module.running = False
+
+    threading.Thread(target=end_game, name="stop-watcher", daemon=True).start()
+    _start_metrics_reporter(updates, stop)
+    module.start_game()
+    module.terminate_game()
+    _send_metrics(updates)
+
+
+def read_proc(pid):
+    """Resident memory (MB) and CPU seconds of `pid` from /proc; None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm") as f:
+            resident = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None, None
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu = (int(fields[11]) + int(fields[12])) / ticks
+    return round(resident * os.sysconf("SC_PAGE_SIZE") / 2**20, 1), round(cpu, 2)
+
+
+class ManagedProgram:
+    """
+    State of one supervised program and its current child process. Tracking
+    programs have no process of their own: `host` is the tracking host. `name`
+    is the instance name, which differs from `program` for games started once
+    per session.
+    """
+
+    def __init__(self, name, source, host=None, program=None):
+        self.name = name
+        self.program = program or name
+        self.source = source
+        self.host = host
+        self.process = None
+        self.commands = None
+        self.stopped = threading.Event()
+        self.stop_event = None
+        self.started_at = None
+        self.restarts = 0
+        self.backoff = BACKOFF_START
+        self.restart_at = None
+        self.exitcode = None
+        self.wanted = True
+
+    def status(self):
+        owner = self.host or self
+        state = "stopped"
+        if owner.process is not None and owner.process.is_alive() and self.wanted:
+            state = "running"
+        elif self.wanted and owner.restart_at is not None:
+            state = "restarting"
+        elif owner.exitcode not in (None, 0):
+            state = "failed"
+        status = {
+            "program": self.program,
+            "state": state,
+            "pid": owner.process.pid if state == "running" else None,
+            "uptime": round(time.monotonic() - self.started_at, 1) if state == "running" else None,
+            "restarts": self.restarts,
+            "exitcode": owner.exitcode,
+        }
+        status["rss_mb"], status["cpu_seconds"] = read_proc(status["pid"]) if status["pid"] else (None, None)
+        return status
+
+
+class Supervisor:
+    """
+    Run programs in child processes so the API process never imports them.
+
+    Tracking programs share one long-lived tracking host process, so switching
+    between them reuses its imports, inference pool, models and camera; the
+    host is stopped after HOST_IDLE_TIMEOUT seconds without programs. Each game
+    runs in a process of its own. start() returns as soon as the work is handed
+    off. A child that exits with an error is restarted (with its programs)
+    after a delay that doubles per crash and resets after a stable run; one
+    that exits cleanly (e.g. game over) is left stopped. stop() waits up to
+    `stop_timeout` seconds for a graceful shutdown and then kills the child.
+    Tracking updates published in the host are forwarded to this process's bus,
+    and the children's metric snapshots are kept for metrics_snapshots().
+    """
+
+    def __init__(self, stop_timeout=STOP_TIMEOUT):
+        self.stop_timeout = stop_timeout
+        self.programs = {}
+        self.host = ManagedProgram(HOST, None)
+        self.host.wanted = False
+        self._host_idle_since = None
+        self._ctx = multiprocessing.get_context("spawn")
+        self._updates = None
+        self._lock = threading.RLock()
+        # Child pid -> its latest metrics snapshot; exited children are folded into _retired_metrics
+        self._metrics = {}
+        self._retired_metrics = None
+        self._retired_pids = set()
+        self._metrics_lock = threading.Lock()
+        self._threads = []
+        self._running = False
+
+    def _ensure_started(self):
+        if self._running:
+            return
+        self._running = True
+        self._updates = self._ctx.Queue(UPDATE_QUEUE_SIZE)
+        # Registered after multiprocessing's own exit handler, which joins live
+        # children, so that our children are asked to stop before it runs
+        atexit.register(self.stop_all)
+        for target, name in ((self._monitor, "supervisor-monitor"), (self._forward, "supervisor-forwarder")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _ensure_host(self):
+        self._host_idle_since = None
+        if self.host.wanted:
+            return
+        self.host = ManagedProgram(HOST, None)
+        self._spawn(self.host)
+
+    def start(self, name, source=None, instance=None):
+        """
+        Launch program `name` (restarting it if it is running). Games can run
+        several times side by side under different `instance` names; stop()
+        and status() then use the instance name.
+        """
+        if name not in PROGRAMS:
+            raise KeyError(name)
+        hosted = PROGRAMS[name][1] == "tracking"
+        if hosted and instance not in (None, name):
+            raise ValueError(f"{name} runs in the shared tracking host and cannot have instances")
+        instance = instance or name
+        with self._lock:
+            self._ensure_started()
+            program = self.programs.get(instance)
+            if program is not None and not hosted:
+                self._terminate(program)
+            if hosted:
+                self._ensure_host()
+                program = ManagedProgram(name, source, self.host)
+                self.host.commands.put(("start", name, source))
+                program.started_at = time.monotonic()
+            else:
+                program = ManagedProgram(instance, source, program=name)
+                self._spawn(program)
+            self.programs[instance] = program
+            return program.status()
+
+    def warm(self, names):
+        """Load tracking programs and their models in the tracking host without starting them."""
+        with self._lock:
+            self._ensure_started()
+            for name in names:
+                if PROGRAMS.get(name, (None, None))[1] != "tracking":
+                    logging.info(f"Only tracking programs can be warmed up, skipping {name}")
+                    continue
+                self._ensure_host()
+                self.host.commands.put(("warm", name, None))
+
+    def stop(self, name, timeout=None):
+        """Stop program (or game instance) `name`; returns False if it is not supervised."""
+        timeout = self.stop_timeout if timeout is None else timeout
+        with self._lock:
+            program = self.programs.get(name)
+            if program is None:
+                return False
+            program.wanted = False
+            program.restart_at = None
+            if program.host is not None:
+                program.stopped.clear()
+                if program.host.process is not None and program.host.process.is_alive():
+                    program.host.commands.put(("stop", name, None))
+                else:
+                    program.stopped.set()
+        if program.host is None:
+            self._terminate(program, timeout)
+        elif not program.stopped.wait(timeout):
+            # A program that does not stop in time takes the host down; others are restarted
+            logging.warning(f"{name} did not stop within {timeout}s, restarting the tracking host")
+            self._terminate(program.host, 0)
+            with self._lock:
+                program.host.restart_at = time.monotonic()
+        return True
+
+    def forget(self, name):
+        """Drop a stopped program from status(), e.g. the game instance of a closed session."""
+        with self._lock:
+            program = self.programs.get(name)
+            if program is not None and not program.wanted:
+                del self.programs[name]
+
+    def stop_all(self):
+        for name in list(self.programs):
+            self.stop(name)
+        self.host.wanted = False
+        self._terminate(self.host)
+
+    def status(self):
+        with self._lock:
+            status = {name: program.status() for name, program in self.programs.items()}
+            if self.host.process is not None:
+                status[HOST] = self.host.status()
+            return status
+
+    def metrics_snapshots(self):
+        """Metric snapshots of the child processes, to add to this process's (see metrics.Registry.render)."""
+        owners = [self.host] + list(self.programs.values())
+        live = {p.process.pid for p in owners if p.process is not None and p.process.is_alive()}
+        with self._metrics_lock:
+            for pid in [pid for pid in self._metrics if pid not in live]:
+                # Keep the counts of exited children so that counters never go backwards
+                self._retired_metrics = REGISTRY.accumulate(self._retired_metrics, self._metrics.pop(pid))
+                self._retired_pids.add(pid)
+            snapshots = list(self._metrics.values())
+            if self._retired_metrics is not None:
+                snapshots.append(self._retired_metrics)
+            return snapshots
+
+    def _spawn(self, program):
+        program.stop_event = self._ctx.Event()
+        if program.name == HOST:
+            program.commands = self._ctx.Queue()
+            target, args = _host_main, (program.commands, self._updates, program.stop_event, os.getpid())
+        else:
+            target, args = _program_main, (program.program, program.source, self._updates, program.stop_event, os.getpid())
+        program.process = self._ctx.Process(target=target, args=args, name=f"program-{program.name}")
+        program.process.start()
+        program.started_at = time.monotonic()
+        program.restart_at = None
+        program.exitcode = None
+        program.wanted = True
+        logging.info(f"Started {program.name} (pid {program.process.pid})")
+        if program.name == HOST:
+            # Bring back the tracking programs that were running when the host crashed
+            for hosted in self.programs.values():
+                if hosted.host is not None and hosted.wanted:
+                    hosted.host = program
+                    hosted.restarts += 1
+                    hosted.started_at = time.monotonic()
+                    program.commands.put(("start", hosted.name, hosted.source))
+
+    def _terminate(self, program, timeout=None):
+        process = program.process
+        if process is None or process.exitcode is not None:
+            return
+        timeout = self.stop_timeout if timeout is None else timeout
+        program.stop_event.set()
+        process.join(timeout)
+        if process.is_alive():
+            logging.warning(f"{program.name} did not stop within {timeout}s, killing it")
+            process.kill()
+            process.join(1.0)
+        program.exitcode = process.exitcode
+        logging.info(f"Stopped {program.name} (exit code {process.exitcode})")
+
+    def _monitor(self):
+        while self._running:
+            time.sleep(0.5)
+            with self._lock:
+                for program in self.programs.values():
+                    if program.host is None:
+                        self._check(program)
+                self._check(self.host)
+                self._evict_host()
+
+    def _evict_host(self):
+        if not self.host.wanted or self.host.restart_at is not None:
+            return
+        if any(program.wanted for program in self.programs.values() if program.host is not None):
+            self._host_idle_since = None
+            return
+        now = time.monotonic()
+        if self._host_idle_since is None:
+            self._host_idle_since = now
+        elif now - self._host_idle_since > HOST_IDLE_TIMEOUT:
+            logging.info(f"Tracking host idle for {HOST_IDLE_TIMEOUT}s, stopping it")
+            self.host.wanted = False
+            self._terminate(self.host)
+
+    def _check(self, program):
+        now = time.monotonic()
+        if program.restart_at is not None:
+            if now >= program.restart_at:
+                if program.name != HOST:
+                    program.restarts += 1
+                self._spawn(program)
+            return
+        process = program.process
+        if not program.wanted or process is None or process.is_alive() or program.exitcode is not None:
+            return
+        program.exitcode = process.exitcode
+        if process.exitcode == 0:
+            logging.info(f"{program.name} exited")
+            program.wanted = False
+            return
+        if now - program.started_at > STABLE_AFTER:
+            program.backoff = BACKOFF_START
+        logging.warning(f"{program.name} crashed (exit code {process.exitcode}), restarting in {program.backoff}s")
+        program.restart_at = now + program.backoff
+        program.backoff = min(program.backoff * 2, BACKOFF_MAX)
+
+    def _forward(self):
+        while self._running:
+            try:
+                update = self._updates.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if isinstance(update, TrackingUpdate):
+                bus.publish(update)
+                continue
+            if update[0] == "metrics":
+                with self._metrics_lock:
+                    # A snapshot that arrives after its process was retired is already counted
+                    if update[1] not in self._retired_pids:
+                        self._metrics[update[1]] = update[2]
+                continue
+            # ("stopped", name, None) acknowledges a stop command sent to the tracking host
+            program = self.programs.get(update[1])
+            if program is not None:
+                program.stopped.set()
+
+
+_supervisor = None
+
+
+def get_supervisor():
+    """Return the process-wide supervisor; its programs are stopped at exit."""
+    global _supervisor
+    if _supervisor is None:
+        _supervisor = Supervisor()
+    return _supervisor
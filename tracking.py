@@ -0,0 +1,154 @@
+import logging
+import os
+import time
+
+import cv2
+import numpy as np
+
+from inference import get_pool
+from metrics import TRACKER_FRAMES
+from roi import RegionOfInterest
+
+logging.basicConfig(level=logging.INFO)
+
+# "1" runs the model on every frame, "N" every Nth frame, "auto" adapts the interval
+DETECT_INTERVAL = os.environ.get("DETECT_INTERVAL", "1")
+MAX_INTERVAL = 8
+
+# Share of landmarks optical flow must follow for a tracked frame to be trusted
+MIN_TRACKED = 0.5
+# Mean drift (pixels) between tracked and re-detected landmarks that still counts as good tracking
+MAX_DRIFT = 4.0
+
+LK_PARAMS = dict(
+    winSize=(21, 21),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+)
+
+
+class DetectTracker:
+    """
+    Run a landmark model every `interval` frames and follow the landmarks
+    with sparse optical flow (cv2.calcOpticalFlowPyrLK) in between.
+
+    Points flow loses are moved with the median motion of the rest; if too
+    few points are followed the frame is re-detected immediately. With
+    interval="auto" each detection is compared with where tracking would
+    have put the landmarks: the interval grows while the drift stays small
+    and halves when it does not.
+
+    The model only sees a downscaled crop around the previous detection
+    (see roi.RegionOfInterest), in static image mode; landmarks are returned
+    in frame coordinates.
+    """
+
+    def __init__(self, kind, key, interval=DETECT_INTERVAL, **options):
+        self.kind = kind
+        self.key = key
+        self.roi = RegionOfInterest()
+        if self.roi.size > 0:
+            # The crop moves between calls, but MediaPipe's video mode propagates its own
+            # landmark ROI in the previous image's coordinates, so it would be wrong until
+            # it re-detected. Static mode runs the detector on every crop instead; that
+            # costs a detection per model call, kept cheap by the small crop, and the
+            # crop itself (re-centred on the last landmarks) does the tracking.
+            options = dict(options, static_image_mode=True)
+        self.options = options
+        self.adaptive = str(interval) == "auto"
+        self.interval = 2 if self.adaptive else max(1, int(interval))
+        self.frames = 0
+        self.model_calls = 0
+        self.detect_time = 0.0
+        self.track_time = 0.0
+        self._landmarks = None
+        self._gray = None
+        self._since_detect = 0
+
+    async def warm_up(self, shape=(480, 640, 3)):
+        """Load the model in its inference worker by running it on a blank frame."""
+        started = time.perf_counter()
+        await get_pool().process(self.kind, np.zeros(shape, dtype=np.uint8), key=self.key, **self.options)
+        logging.info(f"Warmed up {self.kind} model for {self.key} in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    async def process(self, frame, gray=None):
+        """
+        Return the landmark array for `frame`, running the model only when needed.
+        `gray` is the frame in grayscale, if the caller already converted it.
+        """
+        self.frames += 1
+        if self.interval == 1 and not self.adaptive:
+            return await self._detect(frame, None)
+
+        started = time.perf_counter()
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        tracked = None
+        if self._landmarks is not None and len(self._landmarks):
+            tracked = self._track(gray)
+        self.track_time += time.perf_counter() - started
+
+        due = self._since_detect >= self.interval
+        if tracked is None or due:
+            landmarks = await self._detect(frame, tracked if due else None)
+        else:
+            landmarks = tracked
+            self._since_detect += 1
+            TRACKER_FRAMES.labels(self.kind, "track").inc()
+        self._landmarks = landmarks
+        self._gray = gray
+        if self.frames % 300 == 0:
+            logging.info(f"{self.kind} tracker: {self.stats()}")
+        return landmarks
+
+    async def _detect(self, frame, tracked):
+        started = time.perf_counter()
+        image, box = self.roi.crop(frame)
+        landmarks = await get_pool().process(self.kind, image, key=self.key, **self.options)
+        landmarks = self.roi.to_frame(landmarks, box, frame.shape)
+        self.roi.update(landmarks, frame.shape)
+        self.detect_time += time.perf_counter() - started
+        self.model_calls += 1
+        self._since_detect = 1
+        TRACKER_FRAMES.labels(self.kind, "detect").inc()
+        if self.adaptive and tracked is not None and tracked.shape == landmarks.shape:
+            height, width = frame.shape[:2]
+            drift = np.abs((tracked[..., :2] - landmarks[..., :2]) * (width, height)).mean()
+            if drift < MAX_DRIFT:
+                self.interval = min(self.interval + 1, MAX_INTERVAL)
+            else:
+                self.interval = max(1, self.interval // 2)
+        return landmarks
+
+    def _track(self, gray):
+        """Propagate the last landmarks into `gray`; None if tracking is not trustworthy."""
+        if self._gray is None or self._gray.shape != gray.shape:
+            return None
+        height, width = gray.shape
+        scale = np.array([width, height], dtype=np.float32)
+        previous = (self._landmarks[..., :2] * scale).reshape(-1, 1, 2)
+        points, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, previous, None, **LK_PARAMS)
+        found = status.reshape(-1).astype(bool)
+        if found.mean() < MIN_TRACKED:
+            return None
+        motion = points.reshape(-1, 2) - previous.reshape(-1, 2)
+        # Extrapolate lost points with the motion of the ones that were followed
+        motion[~found] = np.median(motion[found], axis=0)
+        tracked = self._landmarks.copy()
+        tracked[..., :2] += (motion / scale).reshape(tracked.shape[:-1] + (2,))
+        return tracked
+
+    def stats(self):
+        """Model-call rate and the estimated share of inference time saved."""
+        if not self.frames:
+            return {"frames": 0, "model_calls": 0, "interval": self.interval, "model_call_rate": 0.0, "estimated_saving": 0.0, "roi_pixel_share": 1.0}
+        per_detect = self.detect_time / max(self.model_calls, 1)
+        spent = self.detect_time + self.track_time
+        return {
+            "frames": self.frames,
+            "model_calls": self.model_calls,
+            "interval": self.interval,
+            "model_call_rate": round(self.model_calls / self.frames, 3),
+            "estimated_saving": round(max(0.0, 1 - spent / (per_detect * self.frames)), 3),
+            "roi_pixel_share": round(self.roi.pixel_share, 3),
+        }
@@ -0,0 +1,99 @@
+"""
+Binary tracking frames for /ws/tracking.
+
+Each bus update becomes one binary WebSocket message:
+
+    header   22 bytes, little-endian (see HEADER)
+    payload  objects * points * 3 values, float16 or float32 little-endian
+    gestures UTF-8, comma separated
+
+With delta encoding the payload holds the difference to the previous frame
+of the same source as reconstructed by the client; keyframes (FLAG_KEYFRAME)
+carry absolute values and are sent first, whenever the shape changes and
+every `keyframe_interval` frames.
+"""
+import struct
+
+import numpy as np
+
+VERSION = 1
+
+# version, source, flags, reserved, objects, points, gestures length, seq, timestamp
+HEADER = struct.Struct("<BBBxHHHId")
+
+SOURCES = ("hand", "eye")
+SOURCE_IDS = {name: index for index, name in enumerate(SOURCES)}
+
+FLAG_FLOAT16 = 0x01
+FLAG_DELTA = 0x02
+FLAG_KEYFRAME = 0x04
+
+DTYPES = {"f16": np.dtype("<f2"), "f32": np.dtype("<f4")}
+
+
+class BinaryEncoder:
+    """Per-connection encoder; keeps the delta reference of each source."""
+
+    def __init__(self, precision="f32", delta=False, keyframe_interval=30):
+        if precision not in DTYPES:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.dtype = DTYPES[precision]
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self._references = {}
+        self._since_keyframe = {}
+
+    def encode(self, update):
+        """Pack one TrackingUpdate into a binary message."""
+        landmarks = np.asarray(update.landmarks, dtype=np.float32)
+        objects, points = landmarks.shape[:2]
+        flags = FLAG_FLOAT16 if self.dtype.itemsize == 2 else 0
+        if self.delta:
+            flags |= FLAG_DELTA
+            reference = self._references.get(update.source)
+            count = self._since_keyframe.get(update.source, 0)
+            if reference is None or reference.shape != landmarks.shape or count >= self.keyframe_interval:
+                flags |= FLAG_KEYFRAME
+                quantized = landmarks.astype(self.dtype)
+                self._references[update.source] = quantized.astype(np.float32)
+                self._since_keyframe[update.source] = 1
+            else:
+                quantized = (landmarks - reference).astype(self.dtype)
+                # Track what the client will reconstruct so quantization error does not accumulate
+                reference += quantized.astype(np.float32)
+                self._since_keyframe[update.source] = count + 1
+        else:
+            quantized = landmarks.astype(self.dtype)
+        gestures = ",".join(update.gestures).encode("utf-8")
+        header = HEADER.pack(
+            VERSION, SOURCE_IDS[update.source], flags,
+            objects, points, len(gestures), update.seq & 0xFFFFFFFF, update.timestamp,
+        )
+        return b"".join((header, quantized.tobytes(), gestures))
+
+
+class BinaryDecoder:
+    """Reference decoder mirroring BinaryEncoder, for Python clients and tools."""
+
+    def __init__(self):
+        self._references = {}
+
+    def decode(self, data):
+        """Return (source, seq, timestamp, landmarks, gestures) for one message."""
+        version, source_id, flags, objects, points, gestures_len, seq, timestamp = HEADER.unpack_from(data)
+        if version != VERSION:
+            raise ValueError(f"Unsupported tracking frame version: {version}")
+        source = SOURCES[source_id]
+        dtype = DTYPES["f16"] if flags & FLAG_FLOAT16 else DTYPES["f32"]
+        count = objects * points * 3
+        values = np.frombuffer(data, dtype=dtype, count=count, offset=HEADER.size)
+        landmarks = values.astype(np.float32).reshape(objects, points, 3)
+        if flags & FLAG_DELTA:
+            if flags & FLAG_KEYFRAME:
+                self._references[source] = landmarks
+            else:
+                landmarks = self._references[source] + landmarks
+                self._references[source] = landmarks
+        offset = HEADER.size + count * dtype.itemsize
+        gestures = data[offset:offset + gestures_len].decode("utf-8")
+        return source, seq, timestamp, landmarks, gestures.split(",") if gestures else []